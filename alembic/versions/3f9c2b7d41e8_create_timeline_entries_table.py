@@ -0,0 +1,53 @@
+"""create timeline_entries table
+
+Revision ID: 3f9c2b7d41e8
+Revises: 8a1f44b1c3e5
+Create Date: 2026-02-02 10:14:27.531904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2b7d41e8'
+down_revision: Union[str, Sequence[str], None] = '8a1f44b1c3e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('timeline_entries',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['author_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'post_id')
+    )
+    op.create_index('ix_timeline_entries_user_id_created_at', 'timeline_entries', ['user_id', 'created_at', 'post_id'], unique=False)
+    op.create_index('ix_timeline_entries_user_id_author_id', 'timeline_entries', ['user_id', 'author_id'], unique=False)
+
+    # Backfill: every user sees their own posts plus the public posts of the users they follow
+    op.execute("""
+        INSERT INTO timeline_entries (user_id, post_id, author_id, created_at)
+        SELECT posts.user_id, posts.id, posts.user_id, posts.created_at
+        FROM posts
+        UNION
+        SELECT follows.follower_id, posts.id, posts.user_id, posts.created_at
+        FROM follows
+        JOIN posts ON posts.user_id = follows.following_id
+        WHERE posts.is_private IS NOT TRUE
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_timeline_entries_user_id_author_id', table_name='timeline_entries')
+    op.drop_index('ix_timeline_entries_user_id_created_at', table_name='timeline_entries')
+    op.drop_table('timeline_entries')
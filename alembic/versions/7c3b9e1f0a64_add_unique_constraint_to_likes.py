@@ -0,0 +1,53 @@
+"""add unique constraint to likes
+
+Revision ID: 7c3b9e1f0a64
+Revises: e4d8a6c2f915
+Create Date: 2026-02-09 14:27:45.902318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3b9e1f0a64'
+down_revision: Union[str, Sequence[str], None] = 'e4d8a6c2f915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Remove duplicate likes that slipped in without a constraint, keeping the oldest
+    op.execute("""
+        DELETE FROM likes
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (PARTITION BY post_id, user_id ORDER BY id) AS rn
+                FROM likes
+            ) ranked
+            WHERE ranked.rn > 1
+        )
+    """)
+    # Recount posts whose likes_count drifted (duplicates or lost concurrent increments)
+    op.execute("""
+        UPDATE posts
+        SET likes_count = counts.total
+        FROM (
+            SELECT post_id, COUNT(*) AS total
+            FROM likes
+            GROUP BY post_id
+        ) AS counts
+        WHERE posts.id = counts.post_id
+        AND posts.likes_count IS DISTINCT FROM counts.total
+    """)
+    op.drop_index('ix_likes_post_id_user_id', table_name='likes', if_exists=True)
+    op.create_unique_constraint('uq_likes_post_id_user_id', 'likes', ['post_id', 'user_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_likes_post_id_user_id', 'likes', type_='unique')
+    op.create_index('ix_likes_post_id_user_id', 'likes', ['post_id', 'user_id'], unique=False)
@@ -0,0 +1,28 @@
+"""add media_pending to posts
+
+Revision ID: 9b4f1c6e2d83
+Revises: 5d2e8f3a9b17
+Create Date: 2026-02-14 16:08:52.774130
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4f1c6e2d83'
+down_revision: Union[str, Sequence[str], None] = '5d2e8f3a9b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('posts', sa.Column('media_pending', sa.Boolean(), server_default='false', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('posts', 'media_pending')
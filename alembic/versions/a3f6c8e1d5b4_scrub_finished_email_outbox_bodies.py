@@ -0,0 +1,30 @@
+"""scrub finished email_outbox bodies
+
+Revision ID: a3f6c8e1d5b4
+Revises: d7b1e4f9a2c8
+Create Date: 2026-03-05 09:41:17.226084
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f6c8e1d5b4'
+down_revision: Union[str, Sequence[str], None] = 'd7b1e4f9a2c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Sent and failed rows kept their OTP / reset token bodies before the sender cleared them
+    op.execute(sa.text("UPDATE email_outbox SET body = '' WHERE status IN ('sent', 'failed') AND body <> ''"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Scrubbed bodies cannot be restored
+    pass
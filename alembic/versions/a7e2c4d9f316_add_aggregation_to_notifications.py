@@ -0,0 +1,45 @@
+"""add aggregation to notifications
+
+Revision ID: a7e2c4d9f316
+Revises: f1c9e3a7b240
+Create Date: 2026-02-25 09:31:57.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e2c4d9f316'
+down_revision: Union[str, Sequence[str], None] = 'f1c9e3a7b240'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows are single-actor notifications, sample_actors falls back to the actor
+    op.add_column('notifications', sa.Column('actor_count', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('notifications', sa.Column('sample_actors', sa.JSON(), nullable=True))
+    op.add_column('notifications', sa.Column('emitted_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Build concurrently so the table stays writable during the migration
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_notifications_user_id_type_post_id_created_at', 'notifications',
+            ['user_id', 'type', 'post_id', 'created_at'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notifications_user_id_type_post_id_created_at', table_name='notifications',
+                      postgresql_concurrently=True, if_exists=True)
+
+    op.drop_column('notifications', 'emitted_at')
+    op.drop_column('notifications', 'sample_actors')
+    op.drop_column('notifications', 'actor_count')
@@ -0,0 +1,38 @@
+"""add notifications_read_at to users
+
+Revision ID: b58d0e7c4a19
+Revises: a7e2c4d9f316
+Create Date: 2026-02-26 16:45:03.882914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b58d0e7c4a19'
+down_revision: Union[str, Sequence[str], None] = 'a7e2c4d9f316'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing reads stay on the per-row is_read flag, no backfill needed
+    op.add_column('users', sa.Column('notifications_read_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Fold the watermark back into per-row flags before dropping it
+    op.execute("""
+        UPDATE notifications
+        SET is_read = true
+        FROM users
+        WHERE notifications.user_id = users.id
+          AND notifications.is_read = false
+          AND notifications.created_at <= users.notifications_read_at
+    """)
+    op.drop_column('users', 'notifications_read_at')
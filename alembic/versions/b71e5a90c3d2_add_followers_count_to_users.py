@@ -0,0 +1,38 @@
+"""add followers_count to users
+
+Revision ID: b71e5a90c3d2
+Revises: 3f9c2b7d41e8
+Create Date: 2026-02-04 16:42:08.118237
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e5a90c3d2'
+down_revision: Union[str, Sequence[str], None] = '3f9c2b7d41e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('followers_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute("""
+        UPDATE users
+        SET followers_count = counts.total
+        FROM (
+            SELECT following_id, COUNT(*) AS total
+            FROM follows
+            GROUP BY following_id
+        ) AS counts
+        WHERE users.id = counts.following_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'followers_count')
@@ -0,0 +1,38 @@
+"""index top-level comments
+
+Revision ID: c4e7a1f9b352
+Revises: b9d4f2e6c871
+Create Date: 2026-03-06 15:22:08.635190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7a1f9b352'
+down_revision: Union[str, Sequence[str], None] = 'b9d4f2e6c871'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Build concurrently so the table stays writable during the migration
+    with op.get_context().autocommit_block():
+        op.create_index('ix_comments_post_id_parent_id_created_at_id', 'comments',
+                        ['post_id', 'parent_id', 'created_at', 'id'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_comments_post_id_created_at_id', table_name='comments',
+                      postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_comments_post_id_created_at_id', 'comments', ['post_id', 'created_at', 'id'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_comments_post_id_parent_id_created_at_id', table_name='comments',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,46 @@
+"""create media_assets table
+
+Revision ID: c6a7d2e41f58
+Revises: 9b4f1c6e2d83
+Create Date: 2026-02-17 11:23:40.615902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6a7d2e41f58'
+down_revision: Union[str, Sequence[str], None] = '9b4f1c6e2d83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('media_assets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('content_type', sa.String(length=50), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('original_url', sa.String(), nullable=False),
+    sa.Column('thumbnail_url', sa.String(), nullable=True),
+    sa.Column('feed_url', sa.String(), nullable=True),
+    sa.Column('full_url', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('content_hash')
+    )
+    op.create_index(op.f('ix_media_assets_id'), 'media_assets', ['id'], unique=False)
+    op.add_column('posts', sa.Column('media_asset_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('posts_media_asset_id_fkey', 'posts', 'media_assets', ['media_asset_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('posts_media_asset_id_fkey', 'posts', type_='foreignkey')
+    op.drop_column('posts', 'media_asset_id')
+    op.drop_index(op.f('ix_media_assets_id'), table_name='media_assets')
+    op.drop_table('media_assets')
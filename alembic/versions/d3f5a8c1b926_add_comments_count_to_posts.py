@@ -0,0 +1,47 @@
+"""add comments_count to posts
+
+Revision ID: d3f5a8c1b926
+Revises: c6a7d2e41f58
+Create Date: 2026-02-19 10:52:16.340871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f5a8c1b926'
+down_revision: Union[str, Sequence[str], None] = 'c6a7d2e41f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('posts', sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill by post id range, committing each batch so row locks are held briefly
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(sa.text("SELECT COALESCE(MAX(id), 0) FROM posts")).scalar_one()
+        for start in range(1, max_id + 1, BATCH_SIZE):
+            bind.execute(sa.text("""
+                UPDATE posts
+                SET comments_count = counts.total
+                FROM (
+                    SELECT post_id, COUNT(*) AS total
+                    FROM comments
+                    WHERE post_id BETWEEN :start AND :end
+                    GROUP BY post_id
+                ) AS counts
+                WHERE posts.id = counts.post_id
+            """), {"start": start, "end": start + BATCH_SIZE - 1})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('posts', 'comments_count')
@@ -0,0 +1,33 @@
+"""add is_pull_author to users
+
+Revision ID: d7b1e4f9a2c8
+Revises: c93a5f1e7d02
+Create Date: 2026-03-04 10:12:48.903517
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7b1e4f9a2c8'
+down_revision: Union[str, Sequence[str], None] = 'c93a5f1e7d02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('is_pull_author', sa.Boolean(), server_default='false', nullable=False))
+    # Authors already at the threshold were being pulled
+    op.execute(sa.text("UPDATE users SET is_pull_author = true WHERE followers_count >= :threshold").bindparams(
+        threshold=int(os.getenv("FANOUT_FOLLOWER_THRESHOLD", 10000))
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'is_pull_author')
@@ -0,0 +1,43 @@
+"""add composite indexes for hot queries
+
+Revision ID: e4d8a6c2f915
+Revises: b71e5a90c3d2
+Create Date: 2026-02-06 11:03:51.640712
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4d8a6c2f915'
+down_revision: Union[str, Sequence[str], None] = 'b71e5a90c3d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_posts_created_at_id', 'posts', ['created_at', 'id']),
+    ('ix_posts_user_id_created_at', 'posts', ['user_id', 'created_at']),
+    ('ix_comments_post_id_created_at', 'comments', ['post_id', 'created_at']),
+    ('ix_notifications_user_id_is_read_created_at', 'notifications', ['user_id', 'is_read', 'created_at']),
+    ('ix_likes_post_id_user_id', 'likes', ['post_id', 'user_id']),
+    ('ix_follows_following_id', 'follows', ['following_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Build concurrently so large tables stay writable during the migration
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
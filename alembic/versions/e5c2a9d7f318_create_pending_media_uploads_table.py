@@ -0,0 +1,45 @@
+"""create pending_media_uploads table
+
+Revision ID: e5c2a9d7f318
+Revises: a3f6c8e1d5b4
+Create Date: 2026-03-05 14:27:53.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c2a9d7f318'
+down_revision: Union[str, Sequence[str], None] = 'a3f6c8e1d5b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('pending_media_uploads',
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('staged_path', sa.String(length=1024), nullable=False),
+    sa.Column('content_type', sa.String(length=50), nullable=False),
+    sa.Column('extension', sa.String(length=10), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('post_id')
+    )
+    op.create_index('ix_pending_media_uploads_next_attempt_at', 'pending_media_uploads', ['next_attempt_at'], unique=False)
+    # Uploads in flight before this table existed lost their staged file with the process, nothing can finish them
+    op.execute(sa.text("UPDATE posts SET media_pending = false WHERE media_pending"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_pending_media_uploads_next_attempt_at', table_name='pending_media_uploads')
+    op.drop_table('pending_media_uploads')
@@ -0,0 +1,71 @@
+"""add threading to comments
+
+Revision ID: f1c9e3a7b240
+Revises: d3f5a8c1b926
+Create Date: 2026-02-23 14:08:41.517302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c9e3a7b240'
+down_revision: Union[str, Sequence[str], None] = 'd3f5a8c1b926'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('comments', sa.Column('parent_id', sa.Integer(), nullable=True))
+    op.add_column('comments', sa.Column('path', sa.String(), nullable=True))
+    op.add_column('comments', sa.Column('depth', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('comments', sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_foreign_key(
+        'comments_parent_id_fkey', 'comments', 'comments',
+        ['parent_id'], ['id'], ondelete='CASCADE'
+    )
+
+    # Existing comments are all top-level, their path is their own zero-padded id
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(sa.text("SELECT COALESCE(MAX(id), 0) FROM comments")).scalar_one()
+        for start in range(1, max_id + 1, BATCH_SIZE):
+            bind.execute(sa.text("""
+                UPDATE comments
+                SET path = LPAD(id::text, 10, '0')
+                WHERE id BETWEEN :start AND :end AND path IS NULL
+            """), {"start": start, "end": start + BATCH_SIZE - 1})
+
+    op.alter_column('comments', 'path', nullable=False)
+
+    # Build concurrently so the table stays writable during the migration
+    with op.get_context().autocommit_block():
+        op.create_index('ix_comments_post_id_path', 'comments', ['post_id', 'path'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_comments_post_id_created_at_id', 'comments', ['post_id', 'created_at', 'id'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_comments_post_id_created_at', table_name='comments',
+                      postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_comments_post_id_created_at', 'comments', ['post_id', 'created_at'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_comments_post_id_created_at_id', table_name='comments',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_comments_post_id_path', table_name='comments',
+                      postgresql_concurrently=True, if_exists=True)
+
+    op.drop_constraint('comments_parent_id_fkey', 'comments', type_='foreignkey')
+    op.drop_column('comments', 'reply_count')
+    op.drop_column('comments', 'depth')
+    op.drop_column('comments', 'path')
+    op.drop_column('comments', 'parent_id')
@@ -1,10 +1,13 @@
 from .config import settings
 from .security import create_tokens, get_password_hash, verify_password, generate_otp, create_password_reset_token, verify_password_reset_token
-from .email import send_otp_email, send_password_reset_email
-from .cloudinary_upload import upload_to_cloudinary
+from .password_hasher import password_hasher, password_needs_rehash, PasswordHasherBusy
+from .email import enqueue_email, enqueue_otp_email, enqueue_password_reset_email
+from .cloudinary_upload import upload_to_cloudinary, stage_upload, store_staged_media, MediaValidationError, MediaTooLarge
 
 
 __all__ = ["settings", "create_tokens", "get_password_hash", 
-           "verify_password", "generate_otp", "send_otp_email", 
+           "verify_password", "generate_otp", "enqueue_email", "enqueue_otp_email", 
            "create_password_reset_token", "verify_password_reset_token", 
-           "send_password_reset_email", "upload_to_cloudinary"]
\ No newline at end of file
+           "enqueue_password_reset_email", "upload_to_cloudinary",
+           "stage_upload", "store_staged_media", "MediaValidationError", "MediaTooLarge",
+           "password_hasher", "password_needs_rehash", "PasswordHasherBusy"]
\ No newline at end of file
@@ -1,7 +1,41 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator
 import cloudinary
-from cloudinary.uploader import upload
+import cloudinary.utils
+from cloudinary.uploader import upload_large
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
 from app.core.config import settings
 
+CLOUDINARY_FOLDER = "social_media_posts"
+# How long Cloudinary accepts a signed upload after the signature's timestamp
+CLOUDINARY_SIGNATURE_SECONDS = 3600
+
+# Accepted media, content type -> file extension
+MEDIA_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "video/mp4": "mp4",
+    "video/webm": "webm",
+}
+
+# Major brands of the ISO base media "ftyp" box that are MP4 video. HEIC/AVIF images and
+# QuickTime movies use the same box with other brands and are not accepted as video/mp4
+MP4_BRANDS = {
+    b"isom", b"iso2", b"iso3", b"iso4", b"iso5", b"iso6",
+    b"mp41", b"mp42", b"avc1", b"dash", b"mmp4", b"M4V ", b"MSNV",
+}
+
 # Configure Cloudinary
 cloudinary.config(
     cloud_name=settings.CLOUD_NAME,
@@ -10,11 +44,288 @@ cloudinary.config(
     # secure=True
 )
 
-def upload_to_cloudinary(file):
-    """Upload file to Cloudinary and return secure URL"""
-    result = upload(
-        file,
-        folder="social_media_posts",
-        resource_type="auto"
+
+class MediaValidationError(ValueError):
+    """The upload is not an accepted media type"""
+
+
+class MediaTooLarge(MediaValidationError):
+    """The upload exceeds MEDIA_MAX_BYTES"""
+
+
+def sniff_media_type(head: bytes) -> tuple[str, str] | None:
+    """Detect the media type from the file's magic bytes, returns (content_type, extension)"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg", "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png", "png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif", "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    if head[4:8] == b"ftyp":
+        if head[8:12] in MP4_BRANDS:
+            return "video/mp4", "mp4"
+        return None
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm", "webm"
+    return None
+
+
+@dataclass
+class StagedMedia:
+    """A validated upload copied to a local temp file, ready to hand to a storage backend"""
+    path: str
+    content_type: str
+    extension: str
+    size: int
+    # SHA-256 of the bytes, used to dedupe identical uploads
+    sha256: str = ""
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _staging_file(extension: str) -> tuple[int, str]:
+    return tempfile.mkstemp(prefix="upload-", suffix=f".{extension}", dir=settings.MEDIA_STAGING_DIR)
+
+
+def stage_upload(file) -> StagedMedia:
+    """
+    Copy a multipart upload to a staging file in MEDIA_CHUNK_BYTES chunks, checking
+    the magic bytes of the first chunk and the running size against MEDIA_MAX_BYTES.
+    Starlette has already spooled the request body by the time this runs, the request
+    itself is capped as it arrives by MediaBodyLimit. Blocking, run it off the event loop.
+    """
+    head = file.read(settings.MEDIA_CHUNK_BYTES)
+    media_type = sniff_media_type(head)
+    if media_type is None:
+        raise MediaValidationError("Unsupported media type")
+
+    fd, path = _staging_file(media_type[1])
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > settings.MEDIA_MAX_BYTES:
+                    raise MediaTooLarge(f"Media exceeds {settings.MEDIA_MAX_BYTES} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+                chunk = file.read(settings.MEDIA_CHUNK_BYTES)
+    except Exception:
+        os.remove(path)
+        raise
+
+    return StagedMedia(
+        path=path,
+        content_type=media_type[0],
+        extension=media_type[1],
+        size=size,
+        sha256=digest.hexdigest()
+    )
+
+
+async def stage_stream(chunks: AsyncIterator[bytes], content_type: str) -> StagedMedia:
+    """
+    stage_upload for a request body streamed straight from the client.
+    The magic bytes must match the content type the upload ticket was issued for.
+    """
+    fd, path = _staging_file(MEDIA_EXTENSIONS[content_type])
+    out = os.fdopen(fd, "wb")
+    digest = hashlib.sha256()
+    head = b""
+    size = 0
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > settings.MEDIA_MAX_BYTES:
+                raise MediaTooLarge(f"Media exceeds {settings.MEDIA_MAX_BYTES} bytes")
+            if len(head) < 16:
+                head += chunk[:16]
+            digest.update(chunk)
+            await asyncio.to_thread(out.write, chunk)
+        out.close()
+
+        media_type = sniff_media_type(head)
+        if media_type is None or media_type[0] != content_type:
+            raise MediaValidationError("Uploaded media does not match the ticket's content type")
+    except Exception:
+        out.close()
+        os.remove(path)
+        raise
+
+    return StagedMedia(
+        path=path,
+        content_type=content_type,
+        extension=media_type[1],
+        size=size,
+        sha256=digest.hexdigest()
     )
-    return result["secure_url"]
+
+
+def _resource_type(content_type: str) -> str:
+    return "video" if content_type.startswith("video/") else "image"
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    def save(self, staged: StagedMedia, key: str | None = None) -> str:
+        """Persist a staged upload and return its public URL"""
+
+    @abstractmethod
+    def create_upload_ticket(self, key: str, content_type: str, media_ref: str) -> dict:
+        """Where and how a client uploads directly to storage: upload_url, method and form fields"""
+
+    @abstractmethod
+    def resolve_upload(self, key: str, content_type: str, version: str | None = None, signature: str | None = None) -> str | None:
+        """
+        Public URL of a direct upload, None if nothing was uploaded under the key.
+        version and signature are what the storage returned to the client for the upload.
+        """
+
+
+class CloudinaryStorage(StorageBackend):
+    def save(self, staged: StagedMedia, key: str | None = None) -> str:
+        # upload_large sends the file in chunks instead of one request body
+        result = upload_large(
+            staged.path,
+            folder=CLOUDINARY_FOLDER,
+            public_id=key,
+            resource_type=_resource_type(staged.content_type),
+            chunk_size=max(settings.MEDIA_CHUNK_BYTES, 5 * 1024 * 1024)
+        )
+        return result["secure_url"]
+
+    def create_upload_ticket(self, key: str, content_type: str, media_ref: str) -> dict:
+        # Signed upload parameters: Cloudinary rejects the upload if any of them is altered,
+        # so the client cannot send a larger file or another format than the ticket allows
+        fields = {
+            "folder": CLOUDINARY_FOLDER,
+            "public_id": key,
+            "allowed_formats": MEDIA_EXTENSIONS[content_type],
+            "max_file_size": settings.MEDIA_MAX_BYTES,
+            # Cloudinary accepts a signature for an hour after its timestamp, backdate it
+            # so it stops being accepted when the ticket expires
+            "timestamp": int(time.time()) - max(0, CLOUDINARY_SIGNATURE_SECONDS - settings.MEDIA_TICKET_EXPIRE_MINUTES * 60),
+        }
+        fields["signature"] = cloudinary.utils.api_sign_request(fields, settings.API_SECRET)
+        fields["api_key"] = settings.API_KEY
+        return {
+            "upload_url": f"https://api.cloudinary.com/v1_1/{settings.CLOUD_NAME}/{_resource_type(content_type)}/upload",
+            "method": "POST",
+            "fields": fields,
+        }
+
+    def resolve_upload(self, key: str, content_type: str, version: str | None = None, signature: str | None = None) -> str | None:
+        # Cloudinary signs public_id and version of every upload response with the API secret,
+        # checking that signature proves the upload without an Admin API (rate-limited) lookup
+        public_id = f"{CLOUDINARY_FOLDER}/{key}"
+        if not version or not signature:
+            return None
+        if not cloudinary.utils.verify_api_response_signature(public_id, version, signature):
+            return None
+        url, _ = cloudinary.utils.cloudinary_url(
+            public_id,
+            resource_type=_resource_type(content_type),
+            type="upload",
+            version=version,
+            format=MEDIA_EXTENSIONS[content_type],
+            secure=True
+        )
+        return url
+
+
+class LocalStorage(StorageBackend):
+    """Files under MEDIA_LOCAL_DIR, served by the app at MEDIA_BASE_URL"""
+
+    def __init__(self, directory: str, base_url: str):
+        self.directory = directory
+        self.base_url = base_url.rstrip("/")
+
+    def path_for(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def save(self, staged: StagedMedia, key: str | None = None) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        key = key or uuid.uuid4().hex
+        shutil.copyfile(staged.path, self.path_for(key, staged.extension))
+        return f"{self.base_url}/{key}.{staged.extension}"
+
+    def create_upload_ticket(self, key: str, content_type: str, media_ref: str) -> dict:
+        # The signed media reference doubles as the signature of the upload URL
+        return {"upload_url": f"/uploads/{media_ref}", "method": "PUT", "fields": {}}
+
+    def resolve_upload(self, key: str, content_type: str, version: str | None = None, signature: str | None = None) -> str | None:
+        extension = MEDIA_EXTENSIONS[content_type]
+        if not os.path.exists(self.path_for(key, extension)):
+            return None
+        return f"{self.base_url}/{key}.{extension}"
+
+
+def get_storage() -> StorageBackend:
+    if settings.MEDIA_STORAGE_BACKEND == "local":
+        return LocalStorage(settings.MEDIA_LOCAL_DIR, settings.MEDIA_BASE_URL)
+    if settings.MEDIA_STORAGE_BACKEND == "cloudinary":
+        return CloudinaryStorage()
+    raise ValueError(f"Unknown MEDIA_STORAGE_BACKEND: {settings.MEDIA_STORAGE_BACKEND}")
+
+
+storage = get_storage()
+
+
+def store_staged_media(staged: StagedMedia, key: str | None = None) -> str:
+    """Upload a staged file to the configured backend and remove the temp copy. Blocking."""
+    try:
+        return storage.save(staged, key)
+    finally:
+        staged.discard()
+
+
+class MediaBodyLimit:
+    """
+    ASGI middleware capping multipart request bodies at MEDIA_MAX_BYTES plus one
+    MEDIA_CHUNK_BYTES of slack for the other form fields and the multipart framing.
+    Checked on Content-Length up front and on the bytes received, so an oversized
+    upload is rejected before Starlette spools it to disk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.max_bytes = settings.MEDIA_MAX_BYTES + settings.MEDIA_CHUNK_BYTES
+
+    async def __call__(self, scope, receive, send):
+        headers = dict(scope.get("headers", [])) if scope["type"] == "http" else {}
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Media exceeds {settings.MEDIA_MAX_BYTES} bytes"
+        content_length = headers.get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": detail}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def upload_to_cloudinary(file):
+    """Validate and upload a file to the configured storage backend and return its URL. Blocking."""
+    return store_staged_media(stage_upload(file))
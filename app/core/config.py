@@ -5,7 +5,33 @@ load_dotenv()
 
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Optional, derived from DATABASE_URL (e.g. postgresql+asyncpg://) when unset
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL")
+    DB_POOL_SIZE: int = int(
+        os.getenv("DB_POOL_SIZE", 5)
+    )
+    DB_MAX_OVERFLOW: int = int(
+        os.getenv("DB_MAX_OVERFLOW", 10)
+    )
+    DB_POOL_TIMEOUT: int = int(
+        os.getenv("DB_POOL_TIMEOUT", 30)
+    )
+    DB_POOL_RECYCLE: int = int(
+        os.getenv("DB_POOL_RECYCLE", 1800)
+    )
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DATABASE_REPLICA_URLS: list[str] = [
+        url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    REPLICA_PIN_SECONDS: int = int(
+        os.getenv("REPLICA_PIN_SECONDS", 5)
+    )
+    REPLICA_HEALTH_CHECK_SECONDS: int = int(
+        os.getenv("REPLICA_HEALTH_CHECK_SECONDS", 15)
+    )
     SECRET_KEY: str = os.getenv("SECRET_KEY")
+    # Shared secret for the /internal endpoints (X-Internal-Token header), they are not mounted when unset
+    INTERNAL_API_TOKEN: str = os.getenv("INTERNAL_API_TOKEN")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(
         os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30)
@@ -18,12 +44,154 @@ class Settings:
     SMTP_USERNAME: str = os.getenv("SMTP_USERNAME")
     SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD")
     EMAIL_FROM:str = os.getenv("EMAIL_FROM")
+    # Plain SMTP (e.g. a local aiosmtpd stand-in) when false
+    SMTP_USE_SSL: bool = os.getenv("SMTP_USE_SSL", "true").lower() == "true"
+    SMTP_TIMEOUT_SECONDS: int = int(
+        os.getenv("SMTP_TIMEOUT_SECONDS", 30)
+    )
+    EMAIL_SMTP_POOL_SIZE: int = int(
+        os.getenv("EMAIL_SMTP_POOL_SIZE", 2)
+    )
+    EMAIL_BATCH_SIZE: int = int(
+        os.getenv("EMAIL_BATCH_SIZE", 50)
+    )
+    EMAIL_POLL_SECONDS: int = int(
+        os.getenv("EMAIL_POLL_SECONDS", 5)
+    )
+    EMAIL_MAX_ATTEMPTS: int = int(
+        os.getenv("EMAIL_MAX_ATTEMPTS", 5)
+    )
+    EMAIL_RETRY_BASE_SECONDS: int = int(
+        os.getenv("EMAIL_RETRY_BASE_SECONDS", 30)
+    )
+    # Sent and failed outbox rows (bodies already scrubbed) are deleted after this many days
+    EMAIL_RETENTION_DAYS: int = int(
+        os.getenv("EMAIL_RETENTION_DAYS", 7)
+    )
     CLOUD_NAME: str = os.getenv("CLOUD_NAME")
     API_KEY: str = os.getenv("API_KEY")
     API_SECRET: str = os.getenv("API_SECRET")
+    # "cloudinary" or "local" (files under MEDIA_LOCAL_DIR served at MEDIA_BASE_URL)
+    MEDIA_STORAGE_BACKEND: str = os.getenv("MEDIA_STORAGE_BACKEND", "cloudinary")
+    MEDIA_LOCAL_DIR: str = os.getenv("MEDIA_LOCAL_DIR", "media")
+    MEDIA_BASE_URL: str = os.getenv("MEDIA_BASE_URL", "/media")
+    MEDIA_MAX_BYTES: int = int(
+        os.getenv("MEDIA_MAX_BYTES", 20 * 1024 * 1024)
+    )
+    MEDIA_CHUNK_BYTES: int = int(
+        os.getenv("MEDIA_CHUNK_BYTES", 1024 * 1024)
+    )
+    # How long an upload ticket from /posts/media/upload-ticket can be used to upload
+    MEDIA_TICKET_EXPIRE_MINUTES: int = int(
+        os.getenv("MEDIA_TICKET_EXPIRE_MINUTES", 15)
+    )
+    # Respond before the storage upload finishes, the post is marked media_pending meanwhile
+    MEDIA_ASYNC_UPLOAD: bool = os.getenv("MEDIA_ASYNC_UPLOAD", "false").lower() == "true"
+    # Where uploads are staged, the system temp dir when unset. Pending async uploads are retried
+    # from here after a restart, so it should survive one and be shared by the app's workers
+    MEDIA_STAGING_DIR: str = os.getenv("MEDIA_STAGING_DIR")
+    MEDIA_UPLOAD_MAX_ATTEMPTS: int = int(
+        os.getenv("MEDIA_UPLOAD_MAX_ATTEMPTS", 5)
+    )
+    # How long a worker owns a pending upload before the sweeper hands it to another one
+    MEDIA_UPLOAD_LEASE_SECONDS: int = int(
+        os.getenv("MEDIA_UPLOAD_LEASE_SECONDS", 600)
+    )
+    MEDIA_UPLOAD_SWEEP_SECONDS: int = int(
+        os.getenv("MEDIA_UPLOAD_SWEEP_SECONDS", 60)
+    )
     VAPID_PUBLIC_KEY: str = os.getenv("VAPID_PUBLIC_KEY")
     VAPID_PRIVATE_KEY: str = os.getenv("VAPID_PRIVATE_KEY")
     VAPID_SUBJECT: str = os.getenv("VAPID_SUBJECT", "mailto:admin@example.com")
+    TIMELINE_BACKFILL_POSTS: int = int(
+        os.getenv("TIMELINE_BACKFILL_POSTS", 50)
+    )
+    FANOUT_FOLLOWER_THRESHOLD: int = int(
+        os.getenv("FANOUT_FOLLOWER_THRESHOLD", 10000)
+    )
+    # A pull author goes back to fan-out only below this, so authors near the threshold don't flip back and forth
+    FANOUT_PULL_EXIT_THRESHOLD: int = int(
+        os.getenv("FANOUT_PULL_EXIT_THRESHOLD", 8000)
+    )
+    # Deepest reply nesting accepted, top-level comments are depth 0
+    COMMENT_MAX_DEPTH: int = int(
+        os.getenv("COMMENT_MAX_DEPTH", 8)
+    )
+    # Coalesce same-type notifications on the same target into one row
+    NOTIFICATION_AGGREGATION: bool = os.getenv("NOTIFICATION_AGGREGATION", "false").lower() == "true"
+    # Events this close to the previous one join its row, an aggregate is re-emitted at most once per window
+    NOTIFICATION_AGGREGATION_WINDOW_SECONDS: int = int(
+        os.getenv("NOTIFICATION_AGGREGATION_WINDOW_SECONDS", 600)
+    )
+    NOTIFICATION_SAMPLE_ACTORS: int = int(
+        os.getenv("NOTIFICATION_SAMPLE_ACTORS", 3)
+    )
+    NOTIFICATION_BATCH_SIZE: int = int(
+        os.getenv("NOTIFICATION_BATCH_SIZE", 100)
+    )
+    # Deliveries in flight at once, web push runs in worker threads
+    NOTIFICATION_CONCURRENCY: int = int(
+        os.getenv("NOTIFICATION_CONCURRENCY", 10)
+    )
+    NOTIFICATION_POLL_SECONDS: int = int(
+        os.getenv("NOTIFICATION_POLL_SECONDS", 2)
+    )
+    # A claimed row not marked sent within the lease is delivered again
+    NOTIFICATION_LEASE_SECONDS: int = int(
+        os.getenv("NOTIFICATION_LEASE_SECONDS", 60)
+    )
+    NOTIFICATION_MAX_ATTEMPTS: int = int(
+        os.getenv("NOTIFICATION_MAX_ATTEMPTS", 5)
+    )
+    NOTIFICATION_RETRY_BASE_SECONDS: int = int(
+        os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", 10)
+    )
+    # Delivered outbox rows are deleted right away, failed ones are kept this many days for inspection
+    NOTIFICATION_OUTBOX_RETENTION_DAYS: int = int(
+        os.getenv("NOTIFICATION_OUTBOX_RETENTION_DAYS", 7)
+    )
+    # Socket.IO emits from sync code waiting on the event loop before further ones are dropped
+    SOCKET_EMIT_MAX_PENDING: int = int(
+        os.getenv("SOCKET_EMIT_MAX_PENDING", 1000)
+    )
+    COUNTER_TTL_SECONDS: int = int(
+        os.getenv("COUNTER_TTL_SECONDS", 300)
+    )
+    COUNTER_RECONCILE_SECONDS: int = int(
+        os.getenv("COUNTER_RECONCILE_SECONDS", 60)
+    )
+    # Counter scopes kept in memory, least recently read are evicted
+    COUNTER_CACHE_MAX_SIZE: int = int(
+        os.getenv("COUNTER_CACHE_MAX_SIZE", 10000)
+    )
+    LIKE_WRITE_BEHIND: bool = os.getenv("LIKE_WRITE_BEHIND", "false").lower() == "true"
+    LIKE_BUFFER_FLUSH_MS: int = int(
+        os.getenv("LIKE_BUFFER_FLUSH_MS", 500)
+    )
+    LIKE_BUFFER_MAX_EVENTS: int = int(
+        os.getenv("LIKE_BUFFER_MAX_EVENTS", 1000)
+    )
+    PRINCIPAL_CACHE_TTL_SECONDS: int = int(
+        os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60)
+    )
+    PRINCIPAL_CACHE_MAX_SIZE: int = int(
+        os.getenv("PRINCIPAL_CACHE_MAX_SIZE", 10000)
+    )
+    TOKEN_CACHE_MAX_SIZE: int = int(
+        os.getenv("TOKEN_CACHE_MAX_SIZE", 10000)
+    )
+    # bcrypt work factor, hashes with another cost are upgraded on the next login
+    BCRYPT_ROUNDS: int = int(
+        os.getenv("BCRYPT_ROUNDS", 12)
+    )
+    PASSWORD_HASH_WORKERS: int = int(
+        os.getenv("PASSWORD_HASH_WORKERS", 2)
+    )
+    PASSWORD_HASH_MAX_PENDING: int = int(
+        os.getenv("PASSWORD_HASH_MAX_PENDING", 32)
+    )
+    # Embed username/email/verified claims in access tokens so auth can skip the users table
+    TOKEN_PRINCIPAL_CLAIMS: bool = os.getenv("TOKEN_PRINCIPAL_CLAIMS", "false").lower() == "true"
 
 settings = Settings()
 
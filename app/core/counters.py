@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from sqlalchemy import select, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Post, Notification, User
+from app.core.config import settings
+from app.database.connection import SessionLocal
+
+
+def public_posts_key():
+    return ("posts", "public")
+
+
+def private_posts_key(user_id: int):
+    return ("posts", "private", user_id)
+
+
+def notifications_key(user_id: int):
+    return ("notifications", "all", user_id)
+
+
+def unread_notifications_key(user_id: int):
+    return ("notifications", "unread", user_id)
+
+
+# Stand-in watermark for users who never marked all notifications as read
+NOTIFICATIONS_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def unread_notifications_filter(read_at):
+    """
+    Unread: not read individually and newer than the read-all watermark.
+    read_at is the user's notifications_read_at, a value or a scalar subquery.
+    """
+    return and_(
+        Notification.is_read == False,
+        Notification.created_at > func.coalesce(read_at, NOTIFICATIONS_EPOCH)
+    )
+
+
+def count_statement(key: tuple):
+    """Build the COUNT(*) query that is the source of truth for a counter scope"""
+    if key[0] == "posts":
+        if key[1] == "public":
+            return select(func.count()).select_from(Post).where(Post.is_private == False)
+        return select(func.count()).select_from(Post).where(
+            Post.is_private == True,
+            Post.user_id == key[2]
+        )
+    if key[0] == "notifications":
+        query = select(func.count()).select_from(Notification).where(Notification.user_id == key[2])
+        if key[1] == "unread":
+            read_at = select(User.notifications_read_at).where(User.id == key[2]).scalar_subquery()
+            query = query.where(unread_notifications_filter(read_at))
+        return query
+    raise ValueError(f"Unknown counter scope: {key}")
+
+
+class CounterCache:
+    """
+    In-process LRU cache of per-scope row counts.
+    Writers adjust cached values after they commit, entries expire after a TTL
+    and are periodically recounted against the database to correct drift
+    (e.g. from other worker processes). A recount keeps the entry's expiry,
+    so scopes nobody reads drop out instead of being recounted forever.
+    """
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self._ttl_seconds = ttl_seconds
+        self._max_size = max_size
+        self._entries: OrderedDict[tuple, tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> int | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: tuple, value: int):
+        with self._lock:
+            self._entries[key] = (max(0, value), time.monotonic() + self._ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def refresh(self, key: tuple, value: int):
+        """Replace a recounted value, keeping its expiry; entries evicted or invalidated meanwhile stay out"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (max(0, value), entry[1])
+
+    def incr(self, key: tuple, delta: int = 1):
+        """Adjust a cached count, scopes that are not cached are left to be counted on next read"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                self._entries[key] = (max(0, value + delta), expires_at)
+
+    def invalidate(self, key: tuple):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def live_keys(self) -> list[tuple]:
+        """Drop expired entries and return the keys still cached"""
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, (_, expires_at) in self._entries.items() if expires_at < now]:
+                del self._entries[key]
+            return list(self._entries)
+
+
+counters = CounterCache(settings.COUNTER_TTL_SECONDS, settings.COUNTER_CACHE_MAX_SIZE)
+
+
+async def get_count(db: AsyncSession, key: tuple) -> int:
+    """Read a count from the cache, falling back to COUNT(*) on a miss"""
+    value = counters.get(key)
+    if value is None:
+        value = (await db.execute(count_statement(key))).scalar_one()
+        counters.set(key, value)
+    return value
+
+
+def reconcile_counters():
+    """Recount every cached scope against the database"""
+    db = SessionLocal()
+    try:
+        for key in counters.live_keys():
+            counters.refresh(key, db.execute(count_statement(key)).scalar_one())
+    finally:
+        db.close()
+
+
+async def run_counter_reconciler():
+    """Background task started from the app lifespan"""
+    while True:
+        await asyncio.sleep(settings.COUNTER_RECONCILE_SECONDS)
+        try:
+            await asyncio.to_thread(reconcile_counters)
+        except Exception as e:
+            print(f"[COUNTERS] Reconciliation failed: {e}")
@@ -1,15 +1,21 @@
-import smtplib
-from email.message import EmailMessage
-from app.core.config import settings
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
-def send_otp_email(to_email: str, otp: str):
-    msg = EmailMessage()
-    msg["Subject"] = "Your OTP Verification Code"
-    msg["From"] = settings.EMAIL_FROM
-    msg["To"] = to_email
+def enqueue_email(db: AsyncSession, to_email: str, subject: str, body: str):
+    """
+    Add an email to the outbox on the caller's session. It is delivered by the
+    background sender once the caller commits, so the request never waits on SMTP.
+    """
+    from app.models import EmailOutbox
 
-    msg.set_content(
+    db.add(EmailOutbox(to_email=to_email, subject=subject, body=body))
+
+
+def enqueue_otp_email(db: AsyncSession, to_email: str, otp: str):
+    enqueue_email(
+        db,
+        to_email,
+        "Your OTP Verification Code",
         f"""
 Your OTP code is: {otp}
 
@@ -18,22 +24,16 @@ Do not share this code with anyone.
         """
     )
 
-    with smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-        server.send_message(msg)
 
-
-def send_password_reset_email(to_email: str, reset_token: str):
-    """Send password reset email with reset link"""
+def enqueue_password_reset_email(db: AsyncSession, to_email: str, reset_token: str):
+    """Queue password reset email with reset link"""
     # Construct reset link - update with your frontend URL
     reset_link = f"http://localhost:5173/reset-password?token={reset_token}"
-    
-    msg = EmailMessage()
-    msg["Subject"] = "Reset Your Password"
-    msg["From"] = settings.EMAIL_FROM
-    msg["To"] = to_email
 
-    msg.set_content(
+    enqueue_email(
+        db,
+        to_email,
+        "Reset Your Password",
         f"""
 You requested to reset your password.
 
@@ -45,7 +45,3 @@ This link is valid for 15 minutes.
 If you didn't request this, please ignore this email.
         """
     )
-
-    with smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-        server.send_message(msg)
\ No newline at end of file
@@ -0,0 +1,205 @@
+import asyncio
+import queue
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from sqlalchemy import select, delete
+from app.core.config import settings
+from app.database.connection import SessionLocal
+
+# How often the sender deletes finished rows past EMAIL_RETENTION_DAYS
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class SMTPConnectionPool:
+    """Authenticated SMTP connections kept open and reused across batches"""
+
+    def __init__(self, size: int):
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        if settings.SMTP_USE_SSL:
+            server = smtplib.SMTP_SSL(settings.SMTP_HOST, int(settings.SMTP_PORT), timeout=settings.SMTP_TIMEOUT_SECONDS)
+        else:
+            server = smtplib.SMTP(settings.SMTP_HOST, int(settings.SMTP_PORT), timeout=settings.SMTP_TIMEOUT_SECONDS)
+        if settings.SMTP_USERNAME:
+            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        return server
+
+    def _discard(self, server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def send(self, message: EmailMessage):
+        try:
+            server = self._idle.get_nowait()
+        except queue.Empty:
+            server = self._connect()
+
+        try:
+            try:
+                server.send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                # The server dropped an idle connection, retry once on a fresh one
+                self._discard(server)
+                server = self._connect()
+                server.send_message(message)
+        except Exception:
+            self._discard(server)
+            raise
+
+        try:
+            self._idle.put_nowait(server)
+        except queue.Full:
+            self._discard(server)
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+class EmailSender:
+    """
+    Delivers email_outbox rows in batches over pooled SMTP connections.
+    Each batch is claimed with FOR UPDATE SKIP LOCKED so several app
+    workers can run a sender without sending the same email twice.
+    Failed sends are retried with exponential backoff. Bodies carry OTPs and
+    reset tokens, so they are cleared once a row is sent or given up on, and
+    finished rows are deleted after EMAIL_RETENTION_DAYS.
+    """
+
+    def __init__(self, pool_size: int):
+        self._smtp = SMTPConnectionPool(pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="email-sender")
+        self._wakeup: asyncio.Event | None = None
+
+    def _deliver(self, message: EmailMessage) -> str | None:
+        try:
+            self._smtp.send(message)
+            return None
+        except Exception as e:
+            return str(e) or e.__class__.__name__
+
+    def send_pending(self) -> int:
+        """Deliver one batch of due outbox rows, returns how many rows were processed"""
+        from app.models import EmailOutbox
+
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            rows = db.execute(
+                select(EmailOutbox)
+                .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+                .limit(settings.EMAIL_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not rows:
+                return 0
+
+            messages = []
+            for row in rows:
+                message = EmailMessage()
+                message["Subject"] = row.subject
+                message["From"] = settings.EMAIL_FROM
+                message["To"] = row.to_email
+                message.set_content(row.body)
+                messages.append(message)
+
+            errors = list(self._executor.map(self._deliver, messages))
+
+            now = datetime.now(timezone.utc)
+            for row, error in zip(rows, errors):
+                row.attempts += 1
+                if error is None:
+                    row.status = "sent"
+                    row.sent_at = now
+                    row.last_error = None
+                    row.body = ""
+                elif row.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                    row.status = "failed"
+                    row.last_error = error
+                    row.body = ""
+                    print(f"[EMAIL] Giving up on email {row.id} to {row.to_email}: {error}")
+                else:
+                    backoff = min(settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (row.attempts - 1), 3600)
+                    row.next_attempt_at = now + timedelta(seconds=backoff)
+                    row.last_error = error
+            db.commit()
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def purge_finished(self) -> int:
+        """Delete sent and failed rows older than EMAIL_RETENTION_DAYS, returns how many"""
+        from app.models import EmailOutbox
+
+        db = SessionLocal()
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=settings.EMAIL_RETENTION_DAYS)
+            # next_attempt_at is the last attempt of a finished row and is covered by the status index
+            deleted = db.execute(
+                delete(EmailOutbox)
+                .where(EmailOutbox.status.in_(("sent", "failed")), EmailOutbox.next_attempt_at < cutoff)
+            ).rowcount
+            db.commit()
+            return deleted
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def notify(self):
+        """Wake the sender right away, called by handlers after committing an enqueue"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        next_purge = time.monotonic()
+        while True:
+            try:
+                processed = await asyncio.to_thread(self.send_pending)
+            except Exception as e:
+                print(f"[EMAIL] Outbox batch failed: {e}")
+                processed = 0
+
+            if time.monotonic() >= next_purge:
+                next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+                try:
+                    purged = await asyncio.to_thread(self.purge_finished)
+                    if purged:
+                        print(f"[EMAIL] Purged {purged} finished outbox row(s)")
+                except Exception as e:
+                    print(f"[EMAIL] Outbox purge failed: {e}")
+
+            # A full batch means more may be due, otherwise wait for a wakeup or the poll interval
+            if processed < settings.EMAIL_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.EMAIL_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._smtp.close()
+
+
+email_sender = EmailSender(settings.EMAIL_SMTP_POOL_SIZE)
+
+
+async def run_email_sender():
+    """Background task started from the app lifespan"""
+    await email_sender.run()
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from sqlalchemy import update, bindparam, func
+from app.models import Post
+from app.core.config import settings
+from app.database.connection import SessionLocal
+
+
+class LikeCountBuffer:
+    """
+    Write-behind buffer for posts.likes_count.
+    Like rows are written immediately, but the counter deltas are summed
+    per post in memory and applied in one batched UPDATE, so a viral post
+    takes one row lock per flush instead of one per like.
+    """
+
+    def __init__(self, max_events: int):
+        self._max_events = max_events
+        self._pending: dict[int, int] = {}
+        self._events = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def add(self, post_id: int, delta: int) -> bool:
+        """Buffer a likes_count delta, returns True once the buffer is full and should be flushed"""
+        with self._lock:
+            self._pending[post_id] = self._pending.get(post_id, 0) + delta
+            self._events += 1
+            return self._events >= self._max_events
+
+    def overlay(self, post_id: int, likes_count: int) -> int:
+        """
+        Stored likes_count plus the deltas not yet taken by a flush.
+        Deltas being flushed are left out: whether likes_count already includes them
+        depends on when it was read relative to the flush's commit, so counting them
+        could double count. A read racing a flush can come out low by that batch only
+        until the commit.
+        """
+        with self._lock:
+            delta = self._pending.get(post_id, 0)
+        return max(0, (likes_count or 0) + delta)
+
+    def flush(self):
+        """Apply every pending delta in a single executemany UPDATE"""
+        with self._flush_lock:
+            with self._lock:
+                batch = {post_id: delta for post_id, delta in self._pending.items() if delta}
+                self._pending = {}
+                self._events = 0
+
+            if not batch:
+                return
+
+            posts = Post.__table__
+            statement = (
+                update(posts)
+                .where(posts.c.id == bindparam("post_id"))
+                .values(likes_count=func.greatest(posts.c.likes_count + bindparam("delta"), 0))
+            )
+
+            db = SessionLocal()
+            try:
+                db.connection().execute(
+                    statement,
+                    [{"post_id": post_id, "delta": delta} for post_id, delta in batch.items()]
+                )
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                # Put the deltas back in one step, readers see them again and the next flush retries them
+                with self._lock:
+                    for post_id, delta in batch.items():
+                        self._pending[post_id] = self._pending.get(post_id, 0) + delta
+                print(f"[LIKE BUFFER] Flush of {len(batch)} post(s) failed: {e}")
+            finally:
+                db.close()
+
+
+like_buffer = LikeCountBuffer(settings.LIKE_BUFFER_MAX_EVENTS)
+
+
+async def run_like_buffer_flusher():
+    """Background task started from the app lifespan when LIKE_WRITE_BEHIND is enabled"""
+    while True:
+        await asyncio.sleep(settings.LIKE_BUFFER_FLUSH_MS / 1000)
+        await asyncio.to_thread(like_buffer.flush)
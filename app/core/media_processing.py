@@ -0,0 +1,93 @@
+import asyncio
+import os
+import tempfile
+from PIL import Image, ImageOps
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import MediaAsset
+from app.core.cloudinary_upload import StagedMedia, MediaValidationError, storage
+
+# Longest edge of each generated variant, images are never upscaled
+VARIANT_SIZES = {
+    "thumbnail": 150,
+    "feed": 640,
+    "full": 1920,
+}
+
+
+def make_variants(staged: StagedMedia) -> dict[str, StagedMedia]:
+    """Resize an image into WebP variants written to temp files, videos get none. Blocking."""
+    if not staged.content_type.startswith("image/"):
+        return {}
+
+    variants = {}
+    try:
+        with Image.open(staged.path) as image:
+            image = ImageOps.exif_transpose(image)
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+            for name, longest_edge in VARIANT_SIZES.items():
+                variant = image.copy()
+                variant.thumbnail((longest_edge, longest_edge))
+                fd, path = tempfile.mkstemp(prefix=f"variant-{name}-", suffix=".webp")
+                os.close(fd)
+                variant.save(path, "WEBP", quality=80)
+                variants[name] = StagedMedia(
+                    path=path,
+                    content_type="image/webp",
+                    extension="webp",
+                    size=os.path.getsize(path),
+                    sha256=staged.sha256
+                )
+    except (OSError, Image.DecompressionBombError) as e:
+        for variant in variants.values():
+            variant.discard()
+        raise MediaValidationError(f"Could not read image: {e}")
+    return variants
+
+
+def store_media_with_variants(staged: StagedMedia) -> dict[str, str | None]:
+    """
+    Store the original and its variants under keys derived from the content hash,
+    so a retried or concurrent upload of the same bytes overwrites rather than duplicates.
+    The staged original is removed once everything is stored and kept if storing fails,
+    so the caller can retry or discard it. Returns MediaAsset URL columns. Blocking.
+    """
+    variants = make_variants(staged)
+    try:
+        urls = {"original_url": storage.save(staged, key=staged.sha256)}
+        for name in VARIANT_SIZES:
+            variant = variants.get(name)
+            urls[f"{name}_url"] = storage.save(variant, key=f"{staged.sha256}_{name}") if variant else None
+    finally:
+        for variant in variants.values():
+            variant.discard()
+    staged.discard()
+    return urls
+
+
+async def get_or_create_media_asset(db: AsyncSession, staged: StagedMedia) -> MediaAsset:
+    """Return the asset for these bytes, processing and storing them only if they are new"""
+    query = select(MediaAsset).where(MediaAsset.content_hash == staged.sha256)
+
+    asset = (await db.execute(query)).scalar_one_or_none()
+    if asset:
+        staged.discard()
+        return asset
+
+    urls = await asyncio.to_thread(store_media_with_variants, staged)
+    asset = MediaAsset(
+        content_hash=staged.sha256,
+        content_type=staged.content_type,
+        size=staged.size,
+        **urls
+    )
+    try:
+        async with db.begin_nested():
+            db.add(asset)
+    except IntegrityError:
+        # The same bytes were stored concurrently, use the asset that won
+        asset = (await db.execute(query)).scalar_one()
+    return asset
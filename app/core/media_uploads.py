@@ -0,0 +1,164 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.cloudinary_upload import StagedMedia, MediaValidationError
+from app.core.media_processing import get_or_create_media_asset
+from app.database.connection import AsyncSessionLocal
+from app.models import Post, PendingMediaUpload
+
+# Pending uploads the sweeper claims per round
+SWEEP_BATCH_SIZE = 20
+
+# Keeps in-process media uploads referenced until they finish
+_media_tasks: set[asyncio.Task] = set()
+
+
+async def enqueue_media_upload(db: AsyncSession, post_id: int, staged: StagedMedia) -> str | None:
+    """
+    Record a post's staged media in the post's transaction. The upload started
+    after the commit holds the lease; if this process dies before it finishes,
+    the sweeper retries it from the staged file once the lease expires.
+    Replaces an upload still pending for the post and returns its staged path,
+    for the caller to remove after the commit.
+    """
+    replaced = (await db.execute(
+        delete(PendingMediaUpload)
+        .where(PendingMediaUpload.post_id == post_id)
+        .returning(PendingMediaUpload.staged_path)
+    )).scalar_one_or_none()
+    db.add(PendingMediaUpload(
+        post_id=post_id,
+        staged_path=staged.path,
+        content_type=staged.content_type,
+        extension=staged.extension,
+        size=staged.size,
+        sha256=staged.sha256,
+        attempts=1,
+        next_attempt_at=datetime.now(timezone.utc) + timedelta(seconds=settings.MEDIA_UPLOAD_LEASE_SECONDS)
+    ))
+    return replaced
+
+
+def start_media_upload(post_id: int, staged: StagedMedia):
+    task = asyncio.create_task(finish_media_upload(post_id, staged, attempts=1))
+    _media_tasks.add(task)
+    task.add_done_callback(_media_tasks.discard)
+
+
+def _is_current(post_id: int, staged: StagedMedia):
+    """The pending row is still this upload, not removed with its post or replaced by newer media"""
+    return (PendingMediaUpload.post_id == post_id, PendingMediaUpload.staged_path == staged.path)
+
+
+async def _give_up(db: AsyncSession, post_id: int, staged: StagedMedia, error: str):
+    current = (await db.execute(
+        delete(PendingMediaUpload).where(*_is_current(post_id, staged)).returning(PendingMediaUpload.post_id)
+    )).scalar_one_or_none()
+    if current is not None:
+        await db.execute(update(Post).where(Post.id == post_id).values(media_pending=False))
+        print(f"[MEDIA] Giving up on media for post {post_id}: {error}")
+    await db.commit()
+    staged.discard()
+
+
+async def finish_media_upload(post_id: int, staged: StagedMedia, attempts: int):
+    """Store a pending post's media, then set its URL and clear media_pending"""
+    async with AsyncSessionLocal() as db:
+        try:
+            asset = await get_or_create_media_asset(db, staged)
+        except MediaValidationError as e:
+            await _give_up(db, post_id, staged, str(e))
+            return
+        except Exception as e:
+            await db.rollback()
+            error = str(e) or e.__class__.__name__
+            if attempts >= settings.MEDIA_UPLOAD_MAX_ATTEMPTS:
+                await _give_up(db, post_id, staged, error)
+                return
+            backoff = min(settings.MEDIA_UPLOAD_SWEEP_SECONDS * 2 ** (attempts - 1), 3600)
+            result = await db.execute(
+                update(PendingMediaUpload)
+                .where(*_is_current(post_id, staged))
+                .values(next_attempt_at=datetime.now(timezone.utc) + timedelta(seconds=backoff), last_error=error)
+            )
+            await db.commit()
+            if result.rowcount == 0:
+                # Nothing will retry a superseded upload
+                staged.discard()
+                return
+            print(f"[MEDIA] Upload for post {post_id} failed, retrying in {backoff}s: {error}")
+            return
+
+        current = (await db.execute(
+            delete(PendingMediaUpload).where(*_is_current(post_id, staged)).returning(PendingMediaUpload.post_id)
+        )).scalar_one_or_none()
+        if current is not None:
+            await db.execute(
+                update(Post)
+                .where(Post.id == post_id)
+                .values(media_pending=False, media_url=asset.original_url, media_asset_id=asset.id)
+            )
+        await db.commit()
+
+
+async def _claim_due_uploads() -> list:
+    """Take the lease on due uploads, FOR UPDATE SKIP LOCKED so workers don't claim the same one"""
+    async with AsyncSessionLocal() as db:
+        due = (
+            select(PendingMediaUpload.post_id)
+            .where(PendingMediaUpload.next_attempt_at <= func.now())
+            .order_by(PendingMediaUpload.next_attempt_at)
+            .limit(SWEEP_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        rows = (await db.execute(
+            update(PendingMediaUpload)
+            .where(PendingMediaUpload.post_id.in_(due.scalar_subquery()))
+            .values(
+                attempts=PendingMediaUpload.attempts + 1,
+                next_attempt_at=func.now() + timedelta(seconds=settings.MEDIA_UPLOAD_LEASE_SECONDS)
+            )
+            .returning(PendingMediaUpload)
+            .execution_options(synchronize_session=False)
+        )).scalars().all()
+        await db.commit()
+        return rows
+
+
+async def sweep_media_uploads() -> int:
+    """Retry pending uploads whose lease expired (failed or abandoned by a dead process)"""
+    rows = await _claim_due_uploads()
+    for row in rows:
+        staged = StagedMedia(
+            path=row.staged_path,
+            content_type=row.content_type,
+            extension=row.extension,
+            size=row.size,
+            sha256=row.sha256
+        )
+        if not os.path.exists(staged.path):
+            async with AsyncSessionLocal() as db:
+                await _give_up(db, row.post_id, staged, "Staged file is gone")
+            continue
+        await finish_media_upload(row.post_id, staged, row.attempts)
+    return len(rows)
+
+
+async def pending_media_path(db: AsyncSession, post_id: int) -> str | None:
+    """Staged path of a post's pending upload, for the caller to remove once the post is deleted"""
+    return (await db.execute(
+        select(PendingMediaUpload.staged_path).where(PendingMediaUpload.post_id == post_id)
+    )).scalar_one_or_none()
+
+
+async def run_media_upload_sweeper():
+    """Background task started from the app lifespan"""
+    while True:
+        try:
+            await sweep_media_uploads()
+        except Exception as e:
+            print(f"[MEDIA] Upload sweep failed: {e}")
+        await asyncio.sleep(settings.MEDIA_UPLOAD_SWEEP_SECONDS)
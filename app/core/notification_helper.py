@@ -1,17 +1,25 @@
+from sqlalchemy import select, insert, update, func
 from sqlalchemy.orm import Session
-from app.models import Notification, NotificationType, User, PushSubscription
-import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Notification, NotificationType, NotificationOutbox, PushSubscription
 import json
-from datetime import datetime
-from app.core.socketio_manager import send_notification_to_user, sio, is_user_connected
+from dataclasses import dataclass
+from functools import partial
+from datetime import datetime, timedelta, timezone
 from app.core.config import settings
+from app.core.counters import counters, notifications_key, unread_notifications_key
+from app.core.notification_outbox import notification_sender
+from app.core.socketio_manager import socket_emitter, is_user_connected
 from app.database.connection import SessionLocal
 from pywebpush import webpush, WebPushException
-import threading
 
 
-def generate_notification_message(notification_type: str, actor_username: str) -> str:
-    """Generate a user-friendly notification message"""
+def generate_notification_message(notification_type: str, actor_username: str, actor_count: int = 1) -> str:
+    """Generate a user-friendly notification message, "alice and 41 others liked your post" for aggregates"""
+    others = actor_count - 1
+    if others > 0:
+        actor_username = f"{actor_username} and {others} other{'s' if others > 1 else ''}"
+
     if notification_type == "follow":
         return f"{actor_username} started following you"
     elif notification_type == "like":
@@ -21,14 +29,170 @@ def generate_notification_message(notification_type: str, actor_username: str) -
     return "New notification"
 
 
-def send_web_push_to_user(user_id: int, notification_data: dict):
-    """Send web push notifications to all stored endpoints for the user."""
+def aggregation_lock(user_id: int, notification_type: NotificationType, post_id: int = None):
+    """
+    Transaction-scoped advisory lock on an aggregation target, taken before aggregation_target.
+    FOR UPDATE only locks a row that already exists, so without it two concurrent first
+    events on the same target would both find nothing and insert two notifications.
+    """
+    return select(func.pg_advisory_xact_lock(
+        user_id,
+        func.hashtext(f"notification:{notification_type.value}:{post_id}")
+    ))
+
+
+def aggregation_target(user_id: int, notification_type: NotificationType, post_id: int = None):
+    """
+    The recent notification a new event of this type on this target folds into.
+    The window slides: each aggregated event bumps created_at.
+    Run it under aggregation_lock.
+    """
+    window_start = func.now() - timedelta(seconds=settings.NOTIFICATION_AGGREGATION_WINDOW_SECONDS)
+    return (
+        select(Notification)
+        .where(
+            Notification.user_id == user_id,
+            Notification.type == notification_type,
+            Notification.post_id.is_(None) if post_id is None else Notification.post_id == post_id,
+            Notification.created_at >= window_start
+        )
+        .order_by(Notification.created_at.desc())
+        .limit(1)
+        .with_for_update()
+    )
+
+
+@dataclass
+class StagedNotification:
+    """A notification written in the caller's transaction, dispatched once it commits"""
+    user_id: int
+    is_new: bool
+    # Socket.IO / web push data, None when the re-emit of an aggregate is throttled
+    payload: dict | None
+    # Outbox row leased for a direct emit from sync code, deleted once the emit succeeds
+    outbox_id: int | None = None
+
+
+def aggregated_values(notification: Notification, actor_id: int, actor_username: str, comment_id: int = None) -> dict:
+    """Fold another event into an aggregate, a repeat actor moves to the front without being counted twice"""
+    samples = notification.sample_actors or []
+    others = [sample for sample in samples if sample["id"] != actor_id]
+    return {
+        "actor_id": actor_id,
+        "actor_count": notification.actor_count + (1 if len(others) == len(samples) else 0),
+        "sample_actors": ([{"id": actor_id, "username": actor_username}] + others)[:settings.NOTIFICATION_SAMPLE_ACTORS],
+        "comment_id": comment_id if comment_id is not None else notification.comment_id,
+        "is_read": False,
+        "created_at": func.now(),
+    }
+
+
+def claim_emit(emitted_at: datetime | None) -> bool:
+    """Whether to emit now, an aggregate is re-emitted at most once per window"""
+    window = timedelta(seconds=settings.NOTIFICATION_AGGREGATION_WINDOW_SECONDS)
+    return emitted_at is None or datetime.now(timezone.utc) - emitted_at >= window
+
+
+def build_notification_write(
+    existing: Notification | None,
+    user_id: int,
+    actor_id: int,
+    actor_username: str,
+    notification_type: NotificationType,
+    post_id: int = None,
+    comment_id: int = None
+):
+    """
+    INSERT a notification, or UPDATE the aggregate it folds into, RETURNING (id, created_at).
+    Returns the statement and the values it writes.
+    """
+    if existing is None:
+        values = {
+            "user_id": user_id,
+            "actor_id": actor_id,
+            "type": notification_type,
+            "post_id": post_id,
+            "comment_id": comment_id,
+            "actor_count": 1,
+            "sample_actors": [{"id": actor_id, "username": actor_username}],
+            "emitted_at": datetime.now(timezone.utc),
+        }
+        statement = insert(Notification).values(**values)
+    else:
+        values = aggregated_values(existing, actor_id, actor_username, comment_id)
+        if claim_emit(existing.emitted_at):
+            values["emitted_at"] = datetime.now(timezone.utc)
+        statement = (
+            update(Notification)
+            .where(Notification.id == existing.id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+    return statement.returning(Notification.id, Notification.created_at), values
+
+
+def notification_payload(
+    notification_id: int,
+    created_at: datetime,
+    notification_type: NotificationType,
+    post_id: int | None,
+    values: dict
+) -> dict:
+    """Socket.IO / web push data from the values a notification write stored"""
+    actor_username = values["sample_actors"][0]["username"]
+    return {
+        "id": notification_id,
+        "type": notification_type.value,
+        "actor_username": actor_username,
+        "actor_id": values["actor_id"],
+        "actor_count": values["actor_count"],
+        "sample_actors": [sample["username"] for sample in values["sample_actors"]],
+        "post_id": post_id,
+        "comment_id": values["comment_id"],
+        "is_read": False,
+        "created_at": created_at.isoformat(),
+        "message": generate_notification_message(
+            notification_type.value,
+            actor_username,
+            values["actor_count"]
+        )
+    }
+
+
+def outbox_insert(staged: StagedNotification, lease_seconds: int = 0):
+    """
+    Queue the Socket.IO / web push delivery in the notification's transaction.
+    A row with a lease is left to the sender only if the direct emit does not
+    acknowledge it before the lease expires.
+    """
+    statement = insert(NotificationOutbox).values(user_id=staged.user_id, payload=staged.payload)
+    if lease_seconds:
+        statement = statement.values(
+            next_attempt_at=func.now() + timedelta(seconds=lease_seconds)
+        ).returning(NotificationOutbox.id)
+    return statement
+
+
+def update_notification_counters(staged: StagedNotification):
+    if staged.is_new:
+        counters.incr(notifications_key(staged.user_id))
+        counters.incr(unread_notifications_key(staged.user_id))
+    else:
+        # The aggregate may have been read before, whether through is_read or the watermark
+        counters.invalidate(unread_notifications_key(staged.user_id))
+
+
+def send_web_push_to_user(user_id: int, notification_data: dict) -> bool:
+    """
+    Send web push notifications to all stored endpoints for the user.
+    Returns False if an endpoint failed in a way worth retrying.
+    """
     print(f"[WEB PUSH] Attempting to send web push to user {user_id}")
     
     if not settings.VAPID_PUBLIC_KEY or not settings.VAPID_PRIVATE_KEY:
         # Skip quietly if VAPID is not configured yet
         print("[WEB PUSH] ERROR: VAPID keys missing; skipping web push")
-        return
+        return True
 
     db = SessionLocal()
     try:
@@ -40,7 +204,7 @@ def send_web_push_to_user(user_id: int, notification_data: dict):
         
         if not subscriptions:
             print(f"[WEB PUSH] No subscriptions found for user {user_id}")
-            return
+            return True
 
         payload = json.dumps({
             "title": "New notification",
@@ -48,6 +212,7 @@ def send_web_push_to_user(user_id: int, notification_data: dict):
             "data": notification_data
         })
 
+        delivered = True
         for sub in subscriptions:
             try:
                 print(f"[WEB PUSH] Sending to endpoint: {sub.endpoint[:50]}...")
@@ -70,161 +235,161 @@ def send_web_push_to_user(user_id: int, notification_data: dict):
                 if status_code in (404, 410):
                     db.delete(sub)
                     db.commit()
+                else:
+                    delivered = False
                 print(f"[WEB PUSH] ERROR: Web push send failed for user {user_id}: {exc}")
             except Exception as exc:
+                delivered = False
                 print(f"[WEB PUSH] ERROR: Unexpected web push error for user {user_id}: {exc}")
+        return delivered
     finally:
         db.close()
 
 
-def schedule_web_push(user_id: int, notification_data: dict):
-    """Run web push in a background thread so API handlers stay responsive."""
-    print(f"[WEB PUSH] Scheduling web push for user {user_id}")
-    threading.Thread(
-        target=send_web_push_to_user,
-        args=(user_id, notification_data),
-        daemon=True
-    ).start()
-
-
-async def create_and_emit_notification(
-    db: Session,
+async def stage_notification(
+    db: AsyncSession,
     user_id: int,
     actor_id: int,
+    actor_username: str,
     notification_type: NotificationType,
     post_id: int = None,
     comment_id: int = None
-) -> Notification:
+) -> StagedNotification:
     """
-    Create a notification in the database and emit it via Socket.IO
-    
+    Write a notification in the caller's transaction without committing it,
+    so a like, comment or follow and its notification are one commit.
+    Call dispatch_notification after the caller commits.
+
     Args:
         db: Database session
         user_id: ID of the user receiving the notification
         actor_id: ID of the user who triggered the notification
+        actor_username: Username of the actor, already loaded by the caller
         notification_type: Type of notification (follow, like, comment)
         post_id: Optional post ID for like/comment notifications
         comment_id: Optional comment ID for comment notifications
-    
-    Returns:
-        Created Notification object
     """
-    # Create notification in database
-    notification = Notification(
+    existing = None
+    if settings.NOTIFICATION_AGGREGATION:
+        await db.execute(aggregation_lock(user_id, notification_type, post_id))
+        existing = (await db.execute(
+            aggregation_target(user_id, notification_type, post_id)
+        )).scalar_one_or_none()
+
+    statement, values = build_notification_write(
+        existing, user_id, actor_id, actor_username, notification_type, post_id, comment_id
+    )
+    notification_id, created_at = (await db.execute(statement)).one()
+
+    staged = StagedNotification(
         user_id=user_id,
-        actor_id=actor_id,
-        type=notification_type,
-        post_id=post_id,
-        comment_id=comment_id
+        is_new=existing is None,
+        payload=notification_payload(notification_id, created_at, notification_type, post_id, values)
+            if "emitted_at" in values else None
     )
-    
-    db.add(notification)
-    db.commit()
-    db.refresh(notification)
-    
-    # Get actor information for the notification
-    actor = db.query(User).filter(User.id == actor_id).first()
-    
-    if actor:
-        # Prepare notification data for socket emission
-        notification_data = {
-            "id": notification.id,
-            "type": notification_type.value,
-            "actor_username": actor.username,
-            "actor_id": actor.id,
-            "post_id": post_id,
-            "comment_id": comment_id,
-            "is_read": False,
-            "created_at": notification.created_at.isoformat(),
-            "message": generate_notification_message(notification_type.value, actor.username)
-        }
-        
-        # Emit notification via Socket.IO and fall back to web push if the user is offline
-        try:
-            asyncio.create_task(send_notification_to_user(user_id, notification_data))
-            user_connected = is_user_connected(user_id)
-            print(f"[NOTIFICATION] User {user_id} connected: {user_connected}")
-            if not user_connected:
-                print(f"[NOTIFICATION] User {user_id} is offline, triggering web push")
-                schedule_web_push(user_id, notification_data)
-            else:
-                print(f"[NOTIFICATION] User {user_id} is online, skipping web push")
-        except Exception as e:
-            print(f"[NOTIFICATION] Error emitting socket notification: {e}")
-    
-    return notification
+    if staged.payload is not None:
+        await db.execute(outbox_insert(staged))
+    return staged
 
 
+def dispatch_notification(staged: StagedNotification):
+    """Update counters once the caller has committed and wake the outbox sender to deliver right away"""
+    update_notification_counters(staged)
+    if staged.payload is not None:
+        notification_sender.notify()
 
-def create_and_emit_notification_sync(
+
+async def create_and_emit_notification(
+    db: AsyncSession,
+    user_id: int,
+    actor_id: int,
+    actor_username: str,
+    notification_type: NotificationType,
+    post_id: int = None,
+    comment_id: int = None
+) -> StagedNotification:
+    """Stage, commit and dispatch a notification on its own, for callers with nothing else to commit"""
+    staged = await stage_notification(
+        db, user_id, actor_id, actor_username, notification_type, post_id, comment_id
+    )
+    await db.commit()
+    dispatch_notification(staged)
+    return staged
+
+
+def stage_notification_sync(
     db: Session,
     user_id: int,
     actor_id: int,
+    actor_username: str,
     notification_type: NotificationType,
     post_id: int = None,
     comment_id: int = None
-) -> Notification:
+) -> StagedNotification:
     """
-    Synchronous wrapper for creating and emitting notifications
-    Use this in synchronous route handlers
+    Synchronous variant for code running on the sync Session fallback
+    (threads, scripts), async route handlers use stage_notification
     """
+    existing = None
+    if settings.NOTIFICATION_AGGREGATION:
+        db.execute(aggregation_lock(user_id, notification_type, post_id))
+        existing = db.execute(
+            aggregation_target(user_id, notification_type, post_id)
+        ).scalar_one_or_none()
 
-    # Create notification in database
-    notification = Notification(
-        user_id=user_id,
-        actor_id=actor_id,
-        type=notification_type,
-        post_id=post_id,
-        comment_id=comment_id
+    statement, values = build_notification_write(
+        existing, user_id, actor_id, actor_username, notification_type, post_id, comment_id
     )
+    notification_id, created_at = db.execute(statement).one()
 
-    db.add(notification)
-    db.commit()
-    db.refresh(notification)
-
-    # Get actor information
-    actor = db.query(User).filter(User.id == actor_id).first()
-
-    if not actor:
-        return notification
+    staged = StagedNotification(
+        user_id=user_id,
+        is_new=existing is None,
+        payload=notification_payload(notification_id, created_at, notification_type, post_id, values)
+            if "emitted_at" in values else None
+    )
+    if staged.payload is not None:
+        if is_user_connected(user_id):
+            staged.outbox_id = db.execute(
+                outbox_insert(staged, lease_seconds=settings.NOTIFICATION_LEASE_SECONDS)
+            ).scalar_one()
+        else:
+            db.execute(outbox_insert(staged))
+    return staged
 
-    # Prepare notification payload
-    notification_data = {
-        "id": notification.id,
-        "type": notification_type.value,
-        "actor_username": actor.username,
-        "actor_id": actor.id,
-        "post_id": post_id,
-        "comment_id": comment_id,
-        "is_read": False,
-        "created_at": notification.created_at.isoformat(),
-        "message": generate_notification_message(
-            notification_type.value,
-            actor.username
-        )
-    }
 
-    # ---- ASYNC SAFE EMISSION FROM SYNC CODE ----
-    
-    def emit_notification():
-        asyncio.run(
-            send_notification_to_user(user_id, notification_data)
+def dispatch_notification_sync(staged: StagedNotification):
+    """dispatch_notification for code running outside the event loop"""
+    update_notification_counters(staged)
+    if staged.payload is None:
+        return
+    if staged.outbox_id is not None:
+        # Emit right away through the bounded emitter, a dropped or failed emit
+        # leaves the leased row to the sender once the lease expires
+        socket_emitter.emit_to_user(
+            staged.user_id,
+            staged.payload,
+            on_sent=partial(notification_sender.acknowledge, staged.outbox_id)
         )
+        return
+    # asyncio.Event is not thread-safe, set it on the loop. If no loop is attached
+    # (e.g. a script), the row waits for a running sender's next poll.
+    socket_emitter.call_soon(notification_sender.notify)
 
-    try:
-        threading.Thread(
-            target=emit_notification,
-            daemon=True
-        ).start()
-        user_connected = is_user_connected(user_id)
-        print(f"[NOTIFICATION SYNC] User {user_id} connected: {user_connected}")
-        if not user_connected:
-            print(f"[NOTIFICATION SYNC] User {user_id} is offline, triggering web push")
-            schedule_web_push(user_id, notification_data)
-        else:
-            print(f"[NOTIFICATION SYNC] User {user_id} is online, skipping web push")
-    except Exception as e:
-        # replace with proper logger in production
-        print(f"[NOTIFICATION SYNC] Error emitting socket notification: {e}")
 
-    return notification
+def create_and_emit_notification_sync(
+    db: Session,
+    user_id: int,
+    actor_id: int,
+    actor_username: str,
+    notification_type: NotificationType,
+    post_id: int = None,
+    comment_id: int = None
+) -> StagedNotification:
+    """Stage, commit and dispatch a notification on the sync Session"""
+    staged = stage_notification_sync(
+        db, user_id, actor_id, actor_username, notification_type, post_id, comment_id
+    )
+    db.commit()
+    dispatch_notification_sync(staged)
+    return staged
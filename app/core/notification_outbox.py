@@ -0,0 +1,201 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.socketio_manager import send_notification_to_user, is_user_connected
+from app.database.connection import AsyncSessionLocal
+from app.models import NotificationOutbox
+
+# How often the sender deletes failed rows past NOTIFICATION_OUTBOX_RETENTION_DAYS
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class NotificationSender:
+    """
+    Delivers notification_outbox rows: a Socket.IO emit when the recipient is
+    connected to this process, web push otherwise.
+    A batch is claimed with FOR UPDATE SKIP LOCKED and leased by pushing its
+    next_attempt_at out, so several app workers can run a sender and rows of a
+    worker that dies mid-delivery are picked up again when the lease expires
+    (at-least-once delivery). Failed deliveries are retried with exponential backoff.
+    Delivered rows are deleted, rows given up on are purged after
+    NOTIFICATION_OUTBOX_RETENTION_DAYS.
+    """
+
+    def __init__(self, concurrency: int):
+        self._concurrency = concurrency
+        self._wakeup: asyncio.Event | None = None
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+        # Seconds from a notification's commit to its delivery, for the last delivered row
+        self.last_delivery_lag_seconds: float | None = None
+
+    async def _claim(self) -> list:
+        async with AsyncSessionLocal() as db:
+            due = (
+                select(NotificationOutbox.id)
+                .where(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= func.now())
+                .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+                .limit(settings.NOTIFICATION_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            rows = (await db.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id.in_(due.scalar_subquery()))
+                .values(
+                    attempts=NotificationOutbox.attempts + 1,
+                    next_attempt_at=func.now() + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS)
+                )
+                .returning(
+                    NotificationOutbox.id,
+                    NotificationOutbox.user_id,
+                    NotificationOutbox.payload,
+                    NotificationOutbox.attempts,
+                    NotificationOutbox.created_at
+                )
+                .execution_options(synchronize_session=False)
+            )).all()
+            await db.commit()
+            return rows
+
+    async def _deliver(self, row, semaphore: asyncio.Semaphore) -> str | None:
+        from app.core.notification_helper import send_web_push_to_user
+
+        async with semaphore:
+            try:
+                if is_user_connected(row.user_id):
+                    if await send_notification_to_user(row.user_id, row.payload):
+                        return None
+                    return "Socket.IO emit failed"
+                if await asyncio.to_thread(send_web_push_to_user, row.user_id, row.payload):
+                    return None
+                return "Web push failed"
+            except Exception as e:
+                return str(e) or e.__class__.__name__
+
+    async def send_pending(self) -> int:
+        """Deliver one batch of due outbox rows, returns how many rows were processed"""
+        rows = await self._claim()
+        if not rows:
+            return 0
+
+        semaphore = asyncio.Semaphore(self._concurrency)
+        errors = await asyncio.gather(*(self._deliver(row, semaphore) for row in rows))
+
+        now = datetime.now(timezone.utc)
+        sent_ids = [row.id for row, error in zip(rows, errors) if error is None]
+        async with AsyncSessionLocal() as db:
+            if sent_ids:
+                await db.execute(
+                    delete(NotificationOutbox)
+                    .where(NotificationOutbox.id.in_(sent_ids))
+                    .execution_options(synchronize_session=False)
+                )
+            for row, error in zip(rows, errors):
+                if error is None:
+                    continue
+                if row.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                    values = {"status": "failed", "last_error": error}
+                    self.failed += 1
+                    print(f"[NOTIFICATION OUTBOX] Giving up on notification {row.payload.get('id')} to user {row.user_id}: {error}")
+                else:
+                    backoff = min(settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (row.attempts - 1), 3600)
+                    values = {"next_attempt_at": now + timedelta(seconds=backoff), "last_error": error}
+                    self.retried += 1
+                await db.execute(
+                    update(NotificationOutbox)
+                    .where(NotificationOutbox.id == row.id)
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+
+        self.delivered += len(sent_ids)
+        if sent_ids:
+            self.last_delivery_lag_seconds = max(
+                (now - row.created_at).total_seconds()
+                for row, error in zip(rows, errors) if error is None
+            )
+        return len(rows)
+
+    async def stats(self, db: AsyncSession) -> dict:
+        """Queue depth, age of the oldest pending row and delivery counters"""
+        depth, oldest = (await db.execute(
+            select(func.count(), func.min(NotificationOutbox.created_at))
+            .where(NotificationOutbox.status == "pending")
+        )).one()
+        return {
+            "queue_depth": depth,
+            "lag_seconds": (datetime.now(timezone.utc) - oldest).total_seconds() if oldest else 0.0,
+            "last_delivery_lag_seconds": self.last_delivery_lag_seconds,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+    async def purge_finished(self) -> int:
+        """Delete finished rows older than NOTIFICATION_OUTBOX_RETENTION_DAYS, returns how many"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.NOTIFICATION_OUTBOX_RETENTION_DAYS)
+        async with AsyncSessionLocal() as db:
+            # Also catches rows marked sent before delivered rows were deleted right away
+            result = await db.execute(
+                delete(NotificationOutbox)
+                .where(NotificationOutbox.status.in_(("sent", "failed")), NotificationOutbox.next_attempt_at < cutoff)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            return result.rowcount
+
+    async def acknowledge(self, outbox_id: int):
+        """Delete a row delivered by a direct emit from sync code, before its lease hands it to the sender"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(NotificationOutbox)
+                .where(NotificationOutbox.id == outbox_id, NotificationOutbox.status == "pending")
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        self.delivered += result.rowcount
+
+    def notify(self):
+        """Wake the sender right away, called on the event loop after a notification commits"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        next_purge = time.monotonic()
+        while True:
+            try:
+                processed = await self.send_pending()
+            except Exception as e:
+                print(f"[NOTIFICATION OUTBOX] Outbox batch failed: {e}")
+                processed = 0
+
+            if time.monotonic() >= next_purge:
+                next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+                try:
+                    purged = await self.purge_finished()
+                    if purged:
+                        print(f"[NOTIFICATION OUTBOX] Purged {purged} finished outbox row(s)")
+                except Exception as e:
+                    print(f"[NOTIFICATION OUTBOX] Outbox purge failed: {e}")
+
+            # A full batch means more may be due, otherwise wait for a wakeup or the poll interval
+            if processed < settings.NOTIFICATION_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.NOTIFICATION_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+
+notification_sender = NotificationSender(settings.NOTIFICATION_CONCURRENCY)
+
+
+async def run_notification_sender():
+    """Background task started from the app lifespan"""
+    await notification_sender.run()
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user fields handlers read, detached from any session"""
+    id: int
+    username: str
+    email: str | None
+    is_verified: bool
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_verified=bool(user.is_verified),
+            is_active=user.is_active is not False
+        )
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> "Principal | None":
+        """Build a principal from access token claims, None if the token predates them"""
+        if "username" not in payload or "verified" not in payload or "active" not in payload:
+            return None
+        return cls(
+            id=int(payload["sub"]),
+            username=payload["username"],
+            email=payload.get("email"),
+            is_verified=bool(payload["verified"]),
+            is_active=bool(payload["active"])
+        )
+
+
+def token_data(user) -> dict:
+    """Token payload for a user, with the claims read back by Principal.from_claims when enabled"""
+    data = {"sub": str(user.id)}
+    if settings.TOKEN_PRINCIPAL_CLAIMS:
+        data.update(
+            username=user.username,
+            email=user.email,
+            verified=bool(user.is_verified),
+            active=user.is_active is not False
+        )
+    return data
+
+
+class PrincipalCache:
+    """
+    LRU cache of principals keyed by user id with a TTL.
+    Entries are invalidated locally when a user changes, other workers
+    pick the change up once the TTL expires.
+    """
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self._ttl = ttl_seconds
+        self._max_size = max_size
+        self._entries: OrderedDict[int, tuple[Principal, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Principal | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def set(self, principal: Principal):
+        with self._lock:
+            self._entries[principal.id] = (principal, time.monotonic() + self._ttl)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+principals = PrincipalCache(settings.PRINCIPAL_CACHE_TTL_SECONDS, settings.PRINCIPAL_CACHE_MAX_SIZE)
@@ -5,7 +5,11 @@ from datetime import datetime, timedelta
 from datetime import datetime, timedelta
 from jose import jwt
 from app.core.config import settings
+from collections import OrderedDict
+import hashlib
 import random
+import threading
+import time
 
 
 def get_password_hash(password: str) -> str:
@@ -14,7 +18,7 @@ def get_password_hash(password: str) -> str:
         raise TypeError("Password must be a string")
     # Convert to bytes and hash
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
@@ -63,12 +67,63 @@ def create_tokens(data: dict):
     }
 
 
+class DecodedTokenCache:
+    """
+    LRU of verified token payloads keyed by the token's SHA-256 digest.
+    Entries live until the token's exp, so a cache hit skips the HMAC check
+    and JSON parsing without ever accepting an expired token.
+    Invalid tokens are not cached.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: bytes) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[digest]
+            self.misses += 1
+            return None
+
+    def set(self, digest: bytes, payload: dict):
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        with self._lock:
+            self._entries[digest] = (payload, expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+decoded_tokens = DecodedTokenCache(settings.TOKEN_CACHE_MAX_SIZE)
+
+
 def decode_access_token(token: str):
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = decoded_tokens.get(digest)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except Exception:
         return None
+    decoded_tokens.set(digest, payload)
+    return payload
     
 
 def generate_otp(length: int = 6) -> str:
@@ -94,4 +149,31 @@ def verify_password_reset_token(token: str) -> str | None:
         email: str = payload.get("sub")
         return email
     except Exception:
-        return None
\ No newline at end of file
+        return None
+
+def create_media_upload_token(user_id: int, key: str, content_type: str) -> str:
+    """
+    Create the signed media reference handed out with an upload ticket.
+    The owner goes in "uid" rather than "sub" so the token can never pass as an access token.
+    """
+    return _create_token(
+        data={"uid": user_id, "key": key, "content_type": content_type},
+        expires_delta=timedelta(minutes=settings.MEDIA_TICKET_EXPIRE_MINUTES),
+        token_type="media_upload"
+    )
+
+
+def verify_media_upload_token(token: str, verify_exp: bool = True) -> dict | None:
+    """Verify a media reference and return its claims (uid, key, content_type) if valid"""
+    try:
+        payload = jwt.decode(
+            token,
+            settings.SECRET_KEY,
+            algorithms=[settings.ALGORITHM],
+            options={"verify_exp": verify_exp}
+        )
+        if payload.get("type") != "media_upload":
+            return None
+        return payload
+    except Exception:
+        return None
@@ -1,6 +1,9 @@
+import asyncio
 import socketio
-from typing import Optional
+import threading
+from typing import Awaitable, Callable, Optional
 from app.models import User
+from app.core.config import settings
 from app.core.security import decode_access_token
 from app.database.connection import SessionLocal
 from urllib.parse import parse_qs
@@ -112,3 +115,101 @@ def get_connected_users_count():
 def is_user_connected(user_id: int) -> bool:
     """Check if a user is currently connected"""
     return str(user_id) in connected_users
+
+
+class LoopEmitter:
+    """
+    Schedules Socket.IO emits from sync code (worker threads, the sync Session
+    fallback) onto the server's event loop with run_coroutine_threadsafe, sio
+    must only be used from the loop it runs on. At most max_pending emits wait
+    on the loop, further ones are dropped and counted instead of piling up.
+    """
+
+    def __init__(self, max_pending: int):
+        self._max_pending = max_pending
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Called from the app lifespan with the loop serving requests"""
+        self._loop = loop
+
+    def detach(self):
+        self._loop = None
+
+    def _admit(self) -> bool:
+        with self._lock:
+            if self._loop is None or self._pending >= self._max_pending:
+                self.dropped += 1
+                return False
+            self._pending += 1
+            self.scheduled += 1
+            return True
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+
+    @staticmethod
+    async def _emit(user_id: int, notification_data: dict, on_sent: Callable[[], Awaitable] | None):
+        if not await send_notification_to_user(user_id, notification_data):
+            raise RuntimeError(f"Socket.IO emit to user {user_id} failed")
+        if on_sent is not None:
+            await on_sent()
+
+    def emit_to_user(
+        self,
+        user_id: int,
+        notification_data: dict,
+        on_sent: Callable[[], Awaitable] | None = None
+    ) -> bool:
+        """
+        Schedule send_notification_to_user without waiting for it, returns False if it was dropped.
+        on_sent is awaited on the loop once the emit succeeded.
+        """
+        if not self._admit():
+            return False
+        # The coroutine is only created once admitted, a dropped emit leaves nothing un-awaited
+        try:
+            future = asyncio.run_coroutine_threadsafe(
+                self._emit(user_id, notification_data, on_sent), self._loop
+            )
+        except RuntimeError:
+            # The loop closed between admission and scheduling
+            with self._lock:
+                self._pending -= 1
+                self.dropped += 1
+            return False
+        future.add_done_callback(self._done)
+        return True
+
+    def call_soon(self, callback: Callable[[], None]) -> bool:
+        """Run a plain callback on the loop, e.g. waking a background task's asyncio.Event"""
+        loop = self._loop
+        if loop is None:
+            return False
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            return False
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "attached": self._loop is not None,
+                "pending": self._pending,
+                "max_pending": self._max_pending,
+                "scheduled": self.scheduled,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+
+socket_emitter = LoopEmitter(settings.SOCKET_EMIT_MAX_PENDING)
@@ -0,0 +1,187 @@
+import heapq
+import itertools
+from sqlalchemy import select, insert, update, delete, union_all, literal, tuple_, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Post, User, Follow, TimelineEntry
+from app.core.config import settings
+
+
+TIMELINE_COLUMNS = ["user_id", "post_id", "author_id", "created_at"]
+
+
+def next_pull_mode(is_pull: bool, followers_count: int) -> bool:
+    """
+    Authors reaching FANOUT_FOLLOWER_THRESHOLD are pulled at read time instead of fanned out,
+    and only go back to fan-out below FANOUT_PULL_EXIT_THRESHOLD
+    """
+    if followers_count >= settings.FANOUT_FOLLOWER_THRESHOLD:
+        return True
+    if followers_count < settings.FANOUT_PULL_EXIT_THRESHOLD:
+        return False
+    return is_pull
+
+
+async def update_fanout_mode(db: AsyncSession, author: User, followers_count: int):
+    """
+    Apply the author's new follower count to their fan-out mode, inside the caller's transaction.
+    The caller must hold the author's row lock (SELECT ... FOR UPDATE) so concurrent
+    follows see each other's switch.
+    """
+    is_pull = next_pull_mode(author.is_pull_author, followers_count)
+    if is_pull == author.is_pull_author:
+        return
+
+    await db.execute(
+        update(User)
+        .where(User.id == author.id)
+        .values(is_pull_author=is_pull)
+        .execution_options(synchronize_session=False)
+    )
+    author.is_pull_author = is_pull
+    if not is_pull:
+        # Posts made in pull mode were never fanned out and follows made in pull mode were
+        # never backfilled, materialize the recent posts for every follower now
+        await backfill_followers(db, author.id)
+
+
+async def fan_out_post(db: AsyncSession, post: Post, include_author: bool = True):
+    """
+    Write a post into the home timeline of every follower of its author.
+    Runs as a single INSERT ... SELECT inside the caller's transaction,
+    the caller is responsible for committing.
+
+    Posts by high-follower authors are only written to the author's own
+    timeline, followers merge them in at read time (see merge_timelines).
+
+    Args:
+        db: Database session
+        post: Flushed post (must already have an id)
+        include_author: Also add the post to the author's own timeline
+    """
+    targets = []
+
+    if include_author:
+        targets.append(
+            select(Post.user_id, Post.id, Post.user_id, Post.created_at)
+            .where(Post.id == post.id)
+        )
+
+    # Private posts are only visible to their author
+    author = await db.get(User, post.user_id)
+    if not post.is_private and not author.is_pull_author:
+        targets.append(
+            select(Follow.follower_id, Post.id, Post.user_id, Post.created_at)
+            .join(Post, Post.user_id == Follow.following_id)
+            .where(Post.id == post.id)
+        )
+
+    if not targets:
+        return
+
+    source = targets[0] if len(targets) == 1 else union_all(*targets)
+    await db.execute(insert(TimelineEntry).from_select(TIMELINE_COLUMNS, source))
+
+
+async def retract_post(db: AsyncSession, post: Post):
+    """Remove a post from every timeline except its author's (e.g. when it becomes private)"""
+    await db.execute(
+        delete(TimelineEntry).where(
+            TimelineEntry.post_id == post.id,
+            TimelineEntry.user_id != post.user_id
+        )
+    )
+
+
+async def backfill_timeline(db: AsyncSession, follower_id: int, following_id: int):
+    """Copy the most recent public posts of a newly followed user into the follower's timeline"""
+    source = (
+        select(literal(follower_id), Post.id, Post.user_id, Post.created_at)
+        .where(Post.user_id == following_id, Post.is_private == False)
+        .order_by(Post.created_at.desc())
+        .limit(settings.TIMELINE_BACKFILL_POSTS)
+    )
+    await db.execute(insert(TimelineEntry).from_select(TIMELINE_COLUMNS, source))
+
+
+async def backfill_followers(db: AsyncSession, author_id: int):
+    """
+    Copy an author's most recent public posts into every follower's timeline, skipping posts
+    already there. Bounded by FANOUT_PULL_EXIT_THRESHOLD x TIMELINE_BACKFILL_POSTS rows.
+    """
+    recent = (
+        select(Post.id, Post.user_id, Post.created_at)
+        .where(Post.user_id == author_id, Post.is_private == False)
+        .order_by(Post.created_at.desc())
+        .limit(settings.TIMELINE_BACKFILL_POSTS)
+        .subquery()
+    )
+    source = (
+        select(Follow.follower_id, recent.c.id, recent.c.user_id, recent.c.created_at)
+        .join(recent, true())
+        .where(Follow.following_id == author_id)
+    )
+    await db.execute(
+        pg_insert(TimelineEntry)
+        .from_select(TIMELINE_COLUMNS, source)
+        .on_conflict_do_nothing(index_elements=["user_id", "post_id"])
+    )
+
+
+async def remove_author_from_timeline(db: AsyncSession, follower_id: int, following_id: int):
+    """Drop every post of an unfollowed user from the follower's timeline"""
+    await db.execute(
+        delete(TimelineEntry).where(
+            TimelineEntry.user_id == follower_id,
+            TimelineEntry.author_id == following_id
+        )
+    )
+
+
+async def get_pull_author_ids(db: AsyncSession, user_id: int) -> list[int]:
+    """Followed users whose posts are not fanned out and must be pulled at read time"""
+    result = await db.execute(
+        select(User.id)
+        .join(Follow, Follow.following_id == User.id)
+        .where(
+            Follow.follower_id == user_id,
+            User.is_pull_author == True
+        )
+    )
+    return list(result.scalars().all())
+
+
+async def get_pulled_posts(
+    db: AsyncSession,
+    author_id: int,
+    position: tuple | None,
+    limit: int
+) -> list[tuple[Post, User]]:
+    """Recent public posts of one pull author, newest first, starting after the cursor position"""
+    query = (
+        select(Post, User)
+        .join(User, Post.user_id == User.id)
+        .where(Post.user_id == author_id, Post.is_private == False)
+    )
+    if position is not None:
+        query = query.where(tuple_(Post.created_at, Post.id) < tuple_(*position))
+
+    result = await db.execute(
+        query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit)
+    )
+    return result.all()
+
+
+def merge_timelines(streams: list[list[tuple[Post, User]]], limit: int) -> list[tuple[Post, User]]:
+    """
+    K-way merge of (Post, User) streams that are each sorted newest first.
+    The streams must be disjoint: the materialized timeline is read without
+    pull authors' entries (see get_home_feed), so each stream's first `limit`
+    rows are enough to fill the page.
+    """
+    ordered = heapq.merge(
+        *streams,
+        key=lambda row: (row[0].created_at, row[0].id),
+        reverse=True
+    )
+    return list(itertools.islice(ordered, limit))
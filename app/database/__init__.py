@@ -1,3 +1,3 @@
-from .connection import Base, engine, SessionLocal
+from .connection import Base, engine, SessionLocal, async_engine, AsyncSessionLocal
 
-__all__ = ["Base", "engine", "SesionLocal"]
\ No newline at end of file
+__all__ = ["Base", "engine", "SessionLocal", "async_engine", "AsyncSessionLocal"]
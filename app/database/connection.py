@@ -1,11 +1,43 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from app.core.config import settings
+from app.database.pool_metrics import PoolMetrics, instrumented_pool_class
 
+
+def get_async_database_url(url: str) -> str:
+    """Swap the sync driver of DATABASE_URL for its asyncio counterpart"""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+def get_pool_options() -> dict:
+    """Pool sizing shared by the sync and async engines, configured through Settings"""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+# Sync engine: used by background jobs, scripts and migrations
 engine = create_engine(
-    settings.DATABASE_URL
+    settings.DATABASE_URL,
+    poolclass=instrumented_pool_class(QueuePool, sync_pool_metrics),
+    **get_pool_options()
 )
+sync_pool_metrics.attach(engine)
 
 SessionLocal = sessionmaker(
     autocommit = False,
@@ -13,4 +45,18 @@ SessionLocal = sessionmaker(
     bind = engine
 )
 
-Base = declarative_base()
\ No newline at end of file
+# Async engine: used by the request handlers so DB waits don't hold a thread
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL),
+    poolclass=instrumented_pool_class(AsyncAdaptedQueuePool, async_pool_metrics),
+    **get_pool_options()
+)
+async_pool_metrics.attach(async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(
+    autoflush= False,
+    expire_on_commit = False,
+    bind = async_engine
+)
+
+Base = declarative_base()
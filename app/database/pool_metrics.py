@@ -0,0 +1,95 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+
+class PoolMetrics:
+    """Connection pool counters fed by SQLAlchemy pool events"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.waits += 1
+            self.total_wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def attach(self, pool_target):
+        """Listen to checkout/checkin/connect/invalidate events of an engine's pool"""
+
+        @event.listens_for(pool_target, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(pool_target, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._lock:
+                self.checkouts += 1
+
+        @event.listens_for(pool_target, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            with self._lock:
+                self.checkins += 1
+
+        @event.listens_for(pool_target, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            stats = {
+                "name": self.name,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "avg_checkout_wait_ms": round(self.total_wait_seconds / self.waits * 1000, 3) if self.waits else 0.0,
+                "max_checkout_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            }
+
+        # QueuePool exposes its live state, other pool classes (e.g. NullPool) do not
+        for key in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, key):
+                stats[key] = getattr(pool, key)()
+        stats["status"] = pool.status()
+        return stats
+
+
+def instrumented_pool_class(base, metrics: PoolMetrics):
+    """
+    Subclass a pool class so the time spent waiting for a connection is recorded.
+    Pool events fire only once a connection has been handed out, so the wait
+    (and timeouts when the pool is exhausted) is measured around _do_get.
+    """
+
+    class InstrumentedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                metrics.record_timeout()
+                raise
+            finally:
+                metrics.record_wait(time.perf_counter() - started)
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import hmac
+import itertools
+import time
+from contextvars import ContextVar
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.config import settings
+from app.database.connection import AsyncSessionLocal, get_async_database_url, get_pool_options
+from app.database.pool_metrics import PoolMetrics, instrumented_pool_class
+
+PIN_COOKIE = "read_primary_until"
+PIN_HEADER = "X-Read-Primary-Until"
+
+# Set per request by track_read_pin, the after_commit listener records the writing user in it
+_request_writer: ContextVar[dict | None] = ContextVar("request_writer", default=None)
+
+
+class Replica:
+    def __init__(self, index: int, url: str):
+        self.name = f"replica-{index}"
+        self.metrics = PoolMetrics(self.name)
+        self.engine = create_async_engine(
+            get_async_database_url(url),
+            poolclass=instrumented_pool_class(AsyncAdaptedQueuePool, self.metrics),
+            **get_pool_options()
+        )
+        self.metrics.attach(self.engine.sync_engine)
+        self.session_factory = async_sessionmaker(
+            autoflush=False,
+            expire_on_commit=False,
+            bind=self.engine
+        )
+        self.healthy = True
+
+
+class ReplicaRouter:
+    """
+    Sends read-only sessions to the read replicas round-robin, skipping
+    replicas that failed their last health check. A user who just committed
+    a write gets a signed pin (cookie and response header) that keeps their
+    reads on the primary for REPLICA_PIN_SECONDS, so they always read their
+    own writes despite replication lag. The pin travels with the client, so
+    it holds whichever worker serves the next request.
+    """
+
+    def __init__(self, urls: list[str], pin_seconds: int):
+        self.replicas = [Replica(index, url) for index, url in enumerate(urls)]
+        self._pin_seconds = pin_seconds
+        self._turn = itertools.count()
+
+    @staticmethod
+    def _sign(user_id: int, until: int) -> str:
+        message = f"{user_id}:{until}".encode()
+        return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+    def pin_token(self, user_id: int) -> str:
+        """Signed "<user_id>.<until>.<mac>" value handed back to a user after a write"""
+        until = int(time.time()) + self._pin_seconds
+        return f"{user_id}.{until}.{self._sign(user_id, until)}"
+
+    def is_pinned(self, user_id: int, token: str | None) -> bool:
+        if not token:
+            return False
+        try:
+            pinned_user, until, mac = token.split(".")
+            pinned_user, until = int(pinned_user), int(until)
+        except ValueError:
+            return False
+        return (
+            pinned_user == user_id
+            and until > time.time()
+            and hmac.compare_digest(mac, self._sign(pinned_user, until))
+        )
+
+    def session_factory_for(self, user_id: int | None = None, pin_token: str | None = None):
+        """Session factory for a read: a healthy replica, or the primary if none or pinned"""
+        if user_id is not None and self.is_pinned(user_id, pin_token):
+            return AsyncSessionLocal
+
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return AsyncSessionLocal
+        return healthy[next(self._turn) % len(healthy)].session_factory
+
+    async def check_health(self):
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    await asyncio.wait_for(conn.execute(text("SELECT 1")), timeout=settings.DB_POOL_TIMEOUT)
+                if not replica.healthy:
+                    print(f"[REPLICA] {replica.name} is back in rotation")
+                replica.healthy = True
+            except Exception as e:
+                if replica.healthy:
+                    print(f"[REPLICA] {replica.name} failed health check, routing reads elsewhere: {e}")
+                replica.healthy = False
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+replica_router = ReplicaRouter(settings.DATABASE_REPLICA_URLS, settings.REPLICA_PIN_SECONDS)
+
+
+@event.listens_for(Session, "after_commit")
+def pin_writer_to_primary(session):
+    """get_verified_user tags the request session with the user id, so commits pin that user"""
+    user_id = session.info.get("user_id")
+    writer = _request_writer.get()
+    if user_id is not None and writer is not None:
+        writer["user_id"] = user_id
+
+
+async def track_read_pin(request, call_next):
+    """HTTP middleware handing a read pin to users whose request committed a write"""
+    writer = {}
+    _request_writer.set(writer)
+    response = await call_next(request)
+    if "user_id" in writer:
+        token = replica_router.pin_token(writer["user_id"])
+        response.headers[PIN_HEADER] = token
+        response.set_cookie(
+            PIN_COOKIE, token, max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite="lax"
+        )
+    return response
+
+
+async def run_replica_health_checker():
+    """Background task started from the app lifespan when read replicas are configured"""
+    while True:
+        await replica_router.check_health()
+        await asyncio.sleep(settings.REPLICA_HEALTH_CHECK_SECONDS)
@@ -1,3 +1,3 @@
-from .auth import get_db, security, get_current_user, get_verified_user
+from .auth import get_db, get_read_db, get_sync_db, security, get_current_user, get_verified_user, require_internal_token
 
-__all__= ["get_db", "security", "get_current_user", "get_verified_user"]
\ No newline at end of file
+__all__= ["get_db", "get_read_db", "get_sync_db", "security", "get_current_user", "get_verified_user", "require_internal_token"]
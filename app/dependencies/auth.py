@@ -1,21 +1,51 @@
-from fastapi import HTTPException, Depends, status
+import hmac
+from fastapi import HTTPException, Depends, Header, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.core.security import decode_access_token
-from app.database.connection import SessionLocal
-from typing import Annotated
+from app.core.principal_cache import Principal, principals
+from app.database.connection import SessionLocal, AsyncSessionLocal
+from app.database.routing import replica_router, PIN_COOKIE, PIN_HEADER
+from typing import Annotated, Optional
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
-def get_db():
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db(
+    request: Request,
+    credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(optional_security)]
+):
+    """Session for read-only handlers, served by a replica unless the caller just wrote"""
+    user_id = None
+    if credentials:
+        payload = decode_access_token(token=credentials.credentials)
+        if payload and payload.get("sub"):
+            user_id = int(payload["sub"])
+
+    pin_token = request.headers.get(PIN_HEADER) or request.cookies.get(PIN_COOKIE)
+    async with replica_router.session_factory_for(user_id, pin_token)() as db:
+        yield db
+
+def get_sync_db():
+    """Sync session fallback for handlers that cannot use the async engine"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
-def get_current_user(credentials: Annotated[HTTPAuthorizationCredentials , Depends(security)], 
-                     db: Annotated[Session, Depends(get_db)]):
+def require_internal_token(x_internal_token: Annotated[Optional[str], Header()] = None):
+    """Guards the operational /internal endpoints with the INTERNAL_API_TOKEN shared secret"""
+    expected = settings.INTERNAL_API_TOKEN
+    if not expected or not x_internal_token or not hmac.compare_digest(x_internal_token, expected):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+def get_current_user(credentials: Annotated[HTTPAuthorizationCredentials , Depends(security)]):
     token = credentials.credentials
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized Access")
@@ -26,25 +56,45 @@ def get_current_user(credentials: Annotated[HTTPAuthorizationCredentials , Depen
     return decode_token
 
 
-def get_verified_user(
+async def get_verified_user(
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    from app.models import User
-    
+    """
+    Returns a Principal (id, username, email, is_verified, is_active) rather than
+    the ORM user, served from the principal cache or the token claims when possible.
+    Handlers that modify the user load it from the session themselves.
+    """
     user_id = int(current_user['sub'])
-    user = db.query(User).filter(User.id == user_id).first()
-    
-    if not user:
+    principal = principals.get(user_id)
+
+    if principal is None and settings.TOKEN_PRINCIPAL_CLAIMS:
+        principal = Principal.from_claims(current_user)
+
+    if principal is None:
+        from app.models import User
+
+        user = await db.get(User, user_id)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        principal = Principal.from_user(user)
+        principals.set(principal)
+
+    if not principal.is_active:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Account is deactivated"
         )
-    
-    if not user.is_verified:
+
+    if not principal.is_verified:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Please verify your email first"
         )
-    
-    return user
\ No newline at end of file
+
+    # Commits on this session pin the user to the primary (read-your-writes)
+    db.info["user_id"] = principal.id
+    return principal
@@ -1,9 +1,23 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.database.connection import engine, Base
-from app.routers import users, posts, likes, comments, follow, notifications, subscription, vapid
-from app.core.socketio_manager import sio
+from app.database.connection import engine, async_engine, Base
+from app.database.routing import replica_router, run_replica_health_checker, track_read_pin, PIN_HEADER
+from app.routers import users, posts, feed, likes, comments, follow, notifications, subscription, vapid, internal, media
+from app.core.socketio_manager import sio, socket_emitter
+from app.core.config import settings
+from app.core.counters import run_counter_reconciler
+from app.core.like_buffer import like_buffer, run_like_buffer_flusher
+from app.core.password_hasher import password_hasher, PasswordHasherBusy
+from app.core.email_outbox import email_sender, run_email_sender
+from app.core.notification_outbox import run_notification_sender
+from app.core.cloudinary_upload import MediaBodyLimit
+from app.core.media_uploads import run_media_upload_sweeper
+from urllib.parse import urlparse
+import asyncio
+import os
 import socketio
 
 
@@ -11,13 +25,50 @@ import socketio
 async def lifespan(app: FastAPI):
     # Startup
     Base.metadata.create_all(bind=engine)
+    if settings.MEDIA_STAGING_DIR:
+        os.makedirs(settings.MEDIA_STAGING_DIR, exist_ok=True)
+    # Sync code schedules Socket.IO work onto the loop serving requests
+    socket_emitter.attach(asyncio.get_running_loop())
+    background_tasks = [
+        asyncio.create_task(run_counter_reconciler()),
+        asyncio.create_task(run_email_sender()),
+        asyncio.create_task(run_notification_sender()),
+        asyncio.create_task(run_media_upload_sweeper()),
+    ]
+    if settings.LIKE_WRITE_BEHIND:
+        background_tasks.append(asyncio.create_task(run_like_buffer_flusher()))
+    if replica_router.replicas:
+        background_tasks.append(asyncio.create_task(run_replica_health_checker()))
     yield
     # Shutdown
-    pass
+    socket_emitter.detach()
+    for task in background_tasks:
+        task.cancel()
+    # Persist like-count deltas that are still buffered
+    await asyncio.to_thread(like_buffer.flush)
+    password_hasher.shutdown()
+    await asyncio.to_thread(email_sender.close)
+    await replica_router.dispose()
+    await async_engine.dispose()
 
 app = FastAPI(lifespan=lifespan)
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please try again shortly"},
+        headers={"Retry-After": "1"}
+    )
+
 # Configure CORS - MUST be first middleware
+# Oversized multipart uploads are refused while they arrive, before the body is spooled
+app.add_middleware(MediaBodyLimit)
+
+# Writers get a pin keeping their next reads on the primary, on whichever worker serves them
+if replica_router.replicas:
+    app.middleware("http")(track_read_pin)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -26,11 +77,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[PIN_HEADER],
 )
 
 
 app.include_router(users.router)
 app.include_router(posts.router)
+app.include_router(feed.router)
 app.include_router(likes.router)
 app.include_router(comments.router)
 app.include_router(follow.router)
@@ -38,6 +91,20 @@ app.include_router(notifications.router)
 app.include_router(subscription.router)
 app.include_router(vapid.router)
 
+# Operational metrics, only served when a shared token is configured to guard them
+if settings.INTERNAL_API_TOKEN:
+    app.include_router(internal.router)
+
+# The local storage backend receives signed uploads and serves media from this app
+if settings.MEDIA_STORAGE_BACKEND == "local":
+    app.include_router(media.router)
+    os.makedirs(settings.MEDIA_LOCAL_DIR, exist_ok=True)
+    app.mount(
+        urlparse(settings.MEDIA_BASE_URL).path.rstrip("/") or "/media",
+        StaticFiles(directory=settings.MEDIA_LOCAL_DIR),
+        name="media"
+    )
+
 @app.get("/", tags=["Root"])
 def root():
     return {"message": "FastAPI project running"}
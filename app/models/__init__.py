@@ -3,6 +3,12 @@ from .posts import Post, Comment, Like
 from .notifications import Notification, NotificationType
 from .follow import Follow
 from .push_subscription import PushSubscription
+from .timeline import TimelineEntry
+from .email_outbox import EmailOutbox
+from .media_asset import MediaAsset
+from .notification_outbox import NotificationOutbox
+from .pending_media_upload import PendingMediaUpload
+from .upload_ticket import UploadTicket
 
 __all__ = [
 	"User",
@@ -13,4 +19,10 @@ __all__ = [
 	"NotificationType",
 	"Follow",
 	"PushSubscription",
+	"TimelineEntry",
+	"EmailOutbox",
+	"MediaAsset",
+	"NotificationOutbox",
+	"PendingMediaUpload",
+	"UploadTicket",
 ]
\ No newline at end of file
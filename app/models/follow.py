@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, UniqueConstraint, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, UniqueConstraint, DateTime, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -13,4 +13,5 @@ class Follow(Base):
 
     __table_args__ = (
         UniqueConstraint("follower_id", "following_id", name="unique_follow"),
+        Index("ix_follows_following_id", "following_id"),
     )
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class MediaAsset(Base):
+    """Stored media keyed by the SHA-256 of its bytes, so identical uploads share one asset"""
+    __tablename__ = "media_assets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, nullable=False)
+    content_type = Column(String(50), nullable=False)
+    size = Column(Integer, nullable=False)
+
+    original_url = Column(String, nullable=False)
+    # Resized variants, only generated for images
+    thumbnail_url = Column(String, nullable=True)
+    feed_url = Column(String, nullable=True)
+    full_url = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
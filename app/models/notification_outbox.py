@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class NotificationOutbox(Base):
+    """Socket.IO / web push delivery of a notification, written in the notification's transaction"""
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Recipient of the notification
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    payload = Column(JSON, nullable=False)
+
+    # pending until delivered (the row is then deleted), or failed once NOTIFICATION_MAX_ATTEMPTS is reached
+    status = Column(String(20), default="pending", server_default="pending", nullable=False)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    # Also the lease: a claimed row is pushed out by NOTIFICATION_LEASE_SECONDS while it is delivered
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -20,8 +20,12 @@ class Notification(Base):
     # User who receives the notification
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
-    # User who triggered the notification
+    # User who triggered the notification (the latest one for an aggregate)
     actor_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    # Aggregation: how many users triggered it and the most recent few, [{"id", "username"}]
+    actor_count = Column(Integer, default=1, server_default="1", nullable=False)
+    sample_actors = Column(JSON, nullable=True)
     
     # Type of notification
     type = Column(Enum(NotificationType), nullable=False)
@@ -33,10 +37,18 @@ class Notification(Base):
     # Notification status
     is_read = Column(Boolean, default=False)
     
+    # Time of the latest event, bumped when an event is aggregated into the row
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Last socket/web push emit, re-emits of an aggregate are throttled on it
+    emitted_at = Column(DateTime(timezone=True), nullable=True)
     
     # Relationships
     user = relationship("User", foreign_keys=[user_id], back_populates="notifications")
     actor = relationship("User", foreign_keys=[actor_id])
     post = relationship("Post")
     comment = relationship("Comment")
+
+    __table_args__ = (
+        Index("ix_notifications_user_id_is_read_created_at", "user_id", "is_read", "created_at"),
+        Index("ix_notifications_user_id_type_post_id_created_at", "user_id", "type", "post_id", "created_at"),
+    )
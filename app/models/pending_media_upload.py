@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class PendingMediaUpload(Base):
+    """Staged media of a post created with MEDIA_ASYNC_UPLOAD, kept until it reaches storage"""
+    __tablename__ = "pending_media_uploads"
+
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    # Staged copy under MEDIA_STAGING_DIR and the StagedMedia fields needed to upload it again
+    staged_path = Column(String(1024), nullable=False)
+    content_type = Column(String(50), nullable=False)
+    extension = Column(String(10), nullable=False)
+    size = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    # Also the lease: a claimed upload is pushed out by MEDIA_UPLOAD_LEASE_SECONDS while it runs
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_pending_media_uploads_next_attempt_at", "next_attempt_at"),
+    )
@@ -5,7 +5,9 @@ from sqlalchemy import (
     Text,
     Boolean,
     DateTime,
-    ForeignKey
+    ForeignKey,
+    Index,
+    UniqueConstraint
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -22,9 +24,14 @@ class Post(Base):
 
     content = Column(Text, nullable=True)
     media_url = Column(String, nullable=True)
+    # True while the media upload is still being finished in the background
+    media_pending = Column(Boolean, default=False, server_default="false", nullable=False)
+    media_asset_id = Column(Integer, ForeignKey("media_assets.id", ondelete="SET NULL"), nullable=True)
 
     is_private = Column(Boolean, default=False)
     likes_count = Column(Integer, default=0)
+    # Maintained in the same transaction as comment inserts/deletes
+    comments_count = Column(Integer, default=0, server_default="0", nullable=False)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -41,6 +48,13 @@ class Post(Base):
         back_populates="post",
         cascade="all, delete-orphan"
     )
+    # Joined so variant URLs come with every post query, including async ones
+    media_asset = relationship("MediaAsset", lazy="joined")
+
+    __table_args__ = (
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_user_id_created_at", "user_id", "created_at"),
+    )
 
 
 class Comment(Base):
@@ -50,9 +64,17 @@ class Comment(Base):
 
     post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Direct parent for replies, NULL for top-level comments
+    parent_id = Column(Integer, ForeignKey("comments.id", ondelete="CASCADE"), nullable=True)
 
     content = Column(Text, nullable=False)
 
+    # Materialized path: the zero-padded ids of every ancestor and this comment concatenated,
+    # so a subtree is one range on (post_id, path) and sorting by path gives display order
+    path = Column(String, nullable=False)
+    depth = Column(Integer, default=0, server_default="0", nullable=False)
+    reply_count = Column(Integer, default=0, server_default="0", nullable=False)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -60,6 +82,12 @@ class Comment(Base):
     post = relationship("Post", back_populates="comments")
     author = relationship("User", back_populates="comments")
 
+    __table_args__ = (
+        # Top-level comments of a post are parent_id IS NULL, newest first
+        Index("ix_comments_post_id_parent_id_created_at_id", "post_id", "parent_id", "created_at", "id"),
+        Index("ix_comments_post_id_path", "post_id", "path"),
+    )
+
 
 class Like(Base):
     __tablename__ = "likes"
@@ -73,4 +101,8 @@ class Like(Base):
 
     # Relationships
     post = relationship("Post", back_populates="likes")
-    user = relationship("User", back_populates="likes")
\ No newline at end of file
+    user = relationship("User", back_populates="likes")
+
+    __table_args__ = (
+        UniqueConstraint("post_id", "user_id", name="uq_likes_post_id_user_id"),
+    )
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from app.database import Base
+
+
+class TimelineEntry(Base):
+    """Materialized home timeline row, written when a post is fanned out to a follower"""
+    __tablename__ = "timeline_entries"
+
+    # Owner of the timeline
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    author_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    # Copy of posts.created_at so the feed can be read from this table alone
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_timeline_entries_user_id_created_at", "user_id", "created_at", "post_id"),
+        Index("ix_timeline_entries_user_id_author_id", "user_id", "author_id"),
+    )
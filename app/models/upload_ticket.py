@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class UploadTicket(Base):
+    """A direct-upload ticket, consumed by the one post its media_ref is attached to"""
+    __tablename__ = "upload_tickets"
+
+    # Storage key of the upload, also carried in the signed media_ref
+    key = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    content_type = Column(String(50), nullable=False)
+
+    # Set by the conditional UPDATE that attaches the media to a post, stays set if the post is deleted
+    used_at = Column(DateTime(timezone=True), nullable=True)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="SET NULL"), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
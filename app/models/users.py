@@ -18,6 +18,14 @@ class User(Base):
     expires_at = Column(DateTime(timezone=True), nullable=True)
     is_used = Column(Boolean, default=False)
 
+    # Maintained by follow/unfollow, decides push vs pull feed delivery
+    followers_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # Fan-out mode, switched with hysteresis on followers_count (see app.core.timeline.next_pull_mode)
+    is_pull_author = Column(Boolean, default=False, server_default="false", nullable=False)
+
+    # "Mark all as read" watermark, notifications created at or before it count as read
+    notifications_read_at = Column(DateTime(timezone=True), nullable=True)
+
     posts = relationship(
         "Post",
         back_populates="author",
@@ -1,161 +1,322 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import Annotated
+from typing import Annotated, Optional
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from app.dependencies import get_db, get_verified_user
+from sqlalchemy import select, update, delete, tuple_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dependencies import get_db, get_read_db, get_verified_user
+from app.core.principal_cache import Principal
 from app.models import Post, User, Comment, Notification, NotificationType
-from app.schemas import CommentResponse, CommentListResponse
+from app.schemas import CommentResponse, CommentListResponse, CommentThreadResponse
 import math
-from app.core.notification_helper import create_and_emit_notification_sync
+from app.core.config import settings
+from app.core.notification_helper import stage_notification, dispatch_notification
+from app.core.pagination import encode_cursor, decode_cursor
 
 router = APIRouter(
     prefix="/posts",
     tags=["comment"]
 )
 
+# Width of each zero-padded id in Comment.path
+PATH_SEGMENT_WIDTH = 10
+
+
 class CommentCreate(BaseModel):
     content: str
+    parent_id: Optional[int] = None
+
+
+def _path_segment(comment_id: int) -> str:
+    return str(comment_id).zfill(PATH_SEGMENT_WIDTH)
+
+
+def _subtree_upper_bound(path: str) -> str:
+    """
+    Smallest path sorting after every descendant of `path`: its last segment plus one.
+    Paths are digits only, so [path, bound) is the subtree under any collation.
+    """
+    head, last = path[:-PATH_SEGMENT_WIDTH], path[-PATH_SEGMENT_WIDTH:]
+    return head + _path_segment(int(last) + 1)
+
+
+def _comment_response(comment: Comment, username: str) -> CommentResponse:
+    return CommentResponse(
+        id=comment.id,
+        post_id=comment.post_id,
+        parent_id=comment.parent_id,
+        depth=comment.depth,
+        reply_count=comment.reply_count,
+        username=username,
+        content=comment.content,
+        created_at=comment.created_at,
+        updated_at=comment.updated_at
+    )
+
 
 @router.post("/{post_id}/comment", response_model=CommentResponse)
-def create_comment(
-    post_id: str,
+async def create_comment(
+    post_id: int,
     content_data: CommentCreate,
-    db: Annotated[Session, Depends(get_db)],
-    user: User = Depends(get_verified_user)
+    db: Annotated[AsyncSession, Depends(get_db)],
+    user: Principal = Depends(get_verified_user)
 ):
-    post = db.query(Post).filter(Post.id == post_id).first()
+    post = await db.get(Post, post_id)
 
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-    
-    new_comment = Comment(post_id = post_id, user_id = user.id, content = content_data.content)
+
+    parent = None
+    if content_data.parent_id is not None:
+        parent = (await db.execute(
+            select(Comment).where(
+                Comment.id == content_data.parent_id,
+                Comment.post_id == post_id
+            )
+        )).scalar_one_or_none()
+
+        if not parent:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent comment not found")
+        if parent.depth >= settings.COMMENT_MAX_DEPTH:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Replies are nested too deeply")
+
+    new_comment = Comment(
+        post_id=post_id,
+        user_id=user.id,
+        content=content_data.content,
+        parent_id=parent.id if parent else None,
+        depth=parent.depth + 1 if parent else 0,
+        path=""
+    )
 
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
+    # The path ends with the comment's own id, flush to get it assigned
+    await db.flush()
+    new_comment.path = (parent.path if parent else "") + _path_segment(new_comment.id)
+
+    if parent:
+        await db.execute(
+            update(Comment)
+            .where(Comment.id == parent.id)
+            .values(reply_count=Comment.reply_count + 1)
+        )
+    await db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values(comments_count=Post.comments_count + 1)
+    )
 
-    # Create notification for post owner (only if not commenting on own post) and emit via Socket.IO
+    # Notify the post owner (only if not commenting on own post) in the same transaction as the comment
+    staged = None
     if post.user_id != user.id:
-        create_and_emit_notification_sync(
+        staged = await stage_notification(
             db=db,
             user_id=post.user_id,
             actor_id=user.id,
+            actor_username=user.username,
             notification_type=NotificationType.COMMENT,
             post_id=post_id,
             comment_id=new_comment.id
         )
+    await db.commit()
+    await db.refresh(new_comment)
 
-    return CommentResponse(
-        id=new_comment.id,
-        post_id=new_comment.post_id,
-        username=user.username,
-        content=new_comment.content,
-        created_at=new_comment.created_at,
-        updated_at=new_comment.updated_at
-    )
+    # Emit via Socket.IO now that the comment and notification are committed
+    if staged:
+        dispatch_notification(staged)
+
+    return _comment_response(new_comment, user.username)
 
 @router.get("/{post_id}/comment", response_model=CommentListResponse)
-def get_comments(
+async def get_comments(
     post_id: int,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor"),
+    include_total: bool = Query(False, description="Count the post's top-level comments"),
+    db: AsyncSession = Depends(get_read_db)
 ):
-
-    post = db.query(Post).filter(Post.id == post_id).first()
+    """
+    Top-level comments of a post, newest first, each with its reply_count.
+    Replies are fetched per comment with the thread endpoint.
+    """
+    post = await db.get(Post, post_id)
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
 
-    total = db.query(Comment).filter(Comment.post_id == post_id).count()
-    offset = (page - 1) * page_size
-    results = (
-        db.query(Comment, User)
+    top_level = (Comment.post_id == post_id, Comment.parent_id.is_(None))
+    query = (
+        select(Comment, User)
         .join(User, Comment.user_id == User.id)
-        .filter(Comment.post_id == post_id)
-        .order_by(Comment.created_at.desc())
-        .offset(offset)
-        .limit(page_size)
-        .all()
+        .where(*top_level)
     )
 
-    total_pages = math.ceil(total / page_size) if total > 0 else 0
+    if cursor is not None:
+        position = decode_cursor(cursor)
+        if not position:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        # Keyset pagination on (post_id, parent_id, created_at, id) instead of OFFSET
+        query = query.where(tuple_(Comment.created_at, Comment.id) < tuple_(*position))
+
+    query = query.order_by(Comment.created_at.desc(), Comment.id.desc())
+    if cursor is None:
+        query = query.offset((page - 1) * page_size)
+
+    # Fetch one extra row to know whether another page exists
+    results = (await db.execute(query.limit(page_size + 1))).all()
+    next_cursor = None
+    if len(results) > page_size:
+        results = results[:page_size]
+        last_comment = results[-1][0]
+        next_cursor = encode_cursor(last_comment.created_at, last_comment.id)
+
+    # posts.comments_count includes replies, the top-level count is only run when asked for
+    total = None
+    total_pages = None
+    if include_total:
+        total = (await db.execute(
+            select(func.count()).select_from(Comment).where(*top_level)
+        )).scalar_one()
+        total_pages = math.ceil(total / page_size)
 
     return CommentListResponse(
-        comments=[CommentResponse(
-            id=comment.id,
-            post_id=comment.post_id,
-            username=user.username,
-            content=comment.content,
-            created_at=comment.created_at,
-            updated_at=comment.updated_at
-        ) for comment, user in results],
+        comments=[_comment_response(comment, user.username) for comment, user in results],
         total=total,
-        page=page,
+        page=page if cursor is None else None,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor
+    )
+
+
+@router.get("/{post_id}/comment/{id}/thread", response_model=CommentThreadResponse)
+async def get_comment_thread(
+    id: int,
+    post_id: int,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    root = (await db.execute(
+        select(Comment).where(Comment.id == id, Comment.post_id == post_id)
+    )).scalar_one_or_none()
+
+    if not root:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
+
+    # The cursor is the path of the last comment returned
+    if cursor is not None and not (
+        cursor.isdigit() and len(cursor) % PATH_SEGMENT_WIDTH == 0 and cursor.startswith(root.path)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+    # The whole subtree in display order is one range scan on ix_comments_post_id_path
+    query = (
+        select(Comment, User)
+        .join(User, Comment.user_id == User.id)
+        .where(
+            Comment.post_id == post_id,
+            Comment.path > cursor if cursor is not None else Comment.path >= root.path,
+            Comment.path < _subtree_upper_bound(root.path)
+        )
+        .order_by(Comment.path)
+    )
+
+    results = (await db.execute(query.limit(limit + 1))).all()
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = results[-1][0].path
+
+    return CommentThreadResponse(
+        comments=[_comment_response(comment, user.username) for comment, user in results],
+        next_cursor=next_cursor
     )
 
 @router.put("/{post_id}/comment/{id}", response_model=CommentResponse)
-def update_comment(
-    id: str,
-    post_id: str,
+async def update_comment(
+    id: int,
+    post_id: int,
     content: str,
-    db: Annotated[Session, Depends(get_db)],
-    user: User = Depends(get_verified_user)
+    db: Annotated[AsyncSession, Depends(get_db)],
+    user: Principal = Depends(get_verified_user)
 ):
-    post = db.query(Post).filter(Post.id == post_id).first()
+    post = await db.get(Post, post_id)
 
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-    
-    comment = db.query(Comment).filter(
-        Comment.id == id,
-        Comment.post_id == post_id,
-        Comment.user_id == user.id
-    ).first()
+
+    comment = (await db.execute(
+        select(Comment).where(
+            Comment.id == id,
+            Comment.post_id == post_id,
+            Comment.user_id == user.id
+        )
+    )).scalar_one_or_none()
 
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
 
     comment.content = content
-    db.commit()
-    db.refresh(comment)
+    await db.commit()
+    await db.refresh(comment)
 
-    return CommentResponse(
-        id=comment.id,
-        post_id=comment.post_id,
-        username=user.username,
-        content=comment.content,
-        created_at=comment.created_at,
-        updated_at=comment.updated_at
-    )
+    return _comment_response(comment, user.username)
 
 
 @router.delete("/{post_id}/comment/{id}")
-def delete_comment(
+async def delete_comment(
     id: int,
     post_id: int,
-    db: Annotated[Session, Depends(get_db)],
-    user: User = Depends(get_verified_user)
+    db: Annotated[AsyncSession, Depends(get_db)],
+    user: Principal = Depends(get_verified_user)
 ):
-    post = db.query(Post).filter(Post.id == post_id).first()
+    post = await db.get(Post, post_id)
 
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-    
-    comment = db.query(Comment).filter(
-        Comment.id == id,
-        Comment.post_id == post_id,
-        Comment.user_id == user.id
-    ).first()
+
+    comment = (await db.execute(
+        select(Comment).where(
+            Comment.id == id,
+            Comment.post_id == post_id,
+            Comment.user_id == user.id
+        )
+    )).scalar_one_or_none()
 
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
 
-    db.delete(comment)
-    db.commit()
+    # Replies go with the comment, delete the subtree in one range so the count stays exact
+    removed = (await db.execute(
+        delete(Comment)
+        .where(
+            Comment.post_id == post_id,
+            Comment.path >= comment.path,
+            Comment.path < _subtree_upper_bound(comment.path)
+        )
+        .execution_options(synchronize_session=False)
+    )).rowcount
+
+    if comment.parent_id is not None:
+        await db.execute(
+            update(Comment)
+            .where(Comment.id == comment.parent_id)
+            .values(reply_count=Comment.reply_count - 1)
+        )
+    await db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values(comments_count=Post.comments_count - removed)
+    )
+    await db.commit()
 
     return {
         "success": True,
         "message": "Comment deleted",
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,87 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Post, User, TimelineEntry
+from app.schemas import PostResponse, PostListResponse, MediaVariants
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.like_buffer import like_buffer
+from app.core.timeline import get_pull_author_ids, get_pulled_posts, merge_timelines
+from app.dependencies import get_verified_user, get_read_db
+from app.core.principal_cache import Principal
+from typing import Optional
+
+router = APIRouter(
+    prefix="/feed",
+    tags=["feed"]
+)
+
+
+@router.get("/home", response_model=PostListResponse)
+async def get_home_feed(
+    page_size: int = Query(10, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor"),
+    db: AsyncSession = Depends(get_read_db),
+    user: Principal = Depends(get_verified_user)
+):
+    position = None
+    if cursor is not None:
+        position = decode_cursor(cursor)
+        if not position:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+
+    pull_author_ids = await get_pull_author_ids(db, user.id)
+
+    # Pushed posts are materialized into timeline_entries on write, so this
+    # is a range scan over (user_id, created_at, post_id)
+    query = (
+        select(Post, User)
+        .join(TimelineEntry, TimelineEntry.post_id == Post.id)
+        .join(User, Post.user_id == User.id)
+        .where(TimelineEntry.user_id == user.id)
+    )
+    if pull_author_ids:
+        # Entries fanned out before an author switched to pull mode come from the
+        # pulled stream instead, so the merged streams never share a post
+        query = query.where(TimelineEntry.author_id.not_in(pull_author_ids))
+    if position is not None:
+        query = query.where(
+            tuple_(TimelineEntry.created_at, TimelineEntry.post_id) < tuple_(*position)
+        )
+    pushed = (await db.execute(
+        query.order_by(
+            TimelineEntry.created_at.desc(),
+            TimelineEntry.post_id.desc()
+        ).limit(page_size + 1)
+    )).all()
+
+    # High-follower authors are not fanned out, merge their recent posts in at read time
+    pulled = [
+        await get_pulled_posts(db, author_id, position, page_size + 1)
+        for author_id in pull_author_ids
+    ]
+    results = merge_timelines([pushed, *pulled], page_size + 1) if pulled else pushed
+
+    next_cursor = None
+    if len(results) > page_size:
+        results = results[:page_size]
+        last_post = results[-1][0]
+        next_cursor = encode_cursor(last_post.created_at, last_post.id)
+
+    return PostListResponse(
+        posts=[PostResponse(
+            id=post.id,
+            content=post.content,
+            media_url=post.media_url,
+            media_pending=post.media_pending,
+            media_variants=MediaVariants.from_asset(post.media_asset),
+            is_private=post.is_private,
+            likes_count=like_buffer.overlay(post.id, post.likes_count),
+            created_at=post.created_at,
+            author_username=author.username
+        ) for post, author in results],
+        page_size=page_size,
+        next_cursor=next_cursor
+    )
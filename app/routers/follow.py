@@ -1,18 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.follow import Follow
 from app.models import User, Notification, NotificationType
-from app.dependencies.auth import get_verified_user, get_db
+from app.dependencies.auth import get_verified_user, get_db, get_read_db
+from app.core.principal_cache import Principal
 from app.schemas import FollowerResponse, FollowerListResponse, FollowingResponse, FollowingListResponse
+from app.core.timeline import backfill_timeline, remove_author_from_timeline, update_fanout_mode
+from app.core.notification_helper import stage_notification, dispatch_notification
 from typing import Annotated
 
 router = APIRouter(prefix="/users", tags=["Follow"])
 
 @router.post("/{user_id}/follow")
-def follow_user(
+async def follow_user(
     user_id: int,
-    db: Annotated[Session, Depends(get_db)],
-    current_user: User = Depends(get_verified_user)
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Principal = Depends(get_verified_user)
 ):
     if user_id == current_user.id:
         raise HTTPException(
@@ -20,14 +24,19 @@ def follow_user(
             detail="You cannot follow yourself"
         )
     
-    user = db.query(User).filter(User.id == user_id, User.is_verified == True).first()
+    # Locked so concurrent follows apply their fan-out mode switches in order
+    user = (await db.execute(
+        select(User).where(User.id == user_id, User.is_verified == True).with_for_update()
+    )).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    already_following = db.query(Follow).filter(
-        Follow.follower_id == current_user.id,
-        Follow.following_id == user_id
-    ).first()
+    already_following = (await db.execute(
+        select(Follow).where(
+            Follow.follower_id == current_user.id,
+            Follow.following_id == user_id
+        )
+    )).scalar_one_or_none()
 
     if already_following:
         raise HTTPException(
@@ -41,33 +50,52 @@ def follow_user(
     )
 
     db.add(follow)
-    db.commit()
+    followers_count = user.followers_count + 1
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(followers_count=User.followers_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    await update_fanout_mode(db, user, followers_count)
+    # Pull authors are merged in at read time, so only pushed authors need a backfill
+    if not user.is_pull_author:
+        await backfill_timeline(db, follower_id=current_user.id, following_id=user_id)
 
-    # Create notification for the followed user and emit via Socket.IO
-    from app.core.notification_helper import create_and_emit_notification_sync
-    create_and_emit_notification_sync(
+    # Notify the followed user in the same transaction as the follow
+    staged = await stage_notification(
         db=db,
         user_id=user_id,
         actor_id=current_user.id,
+        actor_username=current_user.username,
         notification_type=NotificationType.FOLLOW
     )
+    await db.commit()
+
+    # Emit via Socket.IO now that the follow and notification are committed
+    dispatch_notification(staged)
 
     return {"message": "User followed successfully"}
 
 @router.delete("/{user_id}/unfollow")
-def unfollow_user(
+async def unfollow_user(
     user_id: int,
-    db: Annotated[Session, Depends(get_db)],
-    current_user: User = Depends(get_verified_user)
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Principal = Depends(get_verified_user)
 ):
-    target_user = db.query(User).filter(User.id == user_id, User.is_verified == True).first()
+    # Locked so concurrent unfollows apply their fan-out mode switches in order
+    target_user = (await db.execute(
+        select(User).where(User.id == user_id, User.is_verified == True).with_for_update()
+    )).scalar_one_or_none()
     if not target_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    follow = db.query(Follow).filter(
-        Follow.follower_id == current_user.id,
-        Follow.following_id == user_id
-    ).first()
+    follow = (await db.execute(
+        select(Follow).where(
+            Follow.follower_id == current_user.id,
+            Follow.following_id == user_id
+        )
+    )).scalar_one_or_none()
 
     if not follow:
         raise HTTPException(
@@ -75,24 +103,34 @@ def unfollow_user(
             detail="You are not following this user"
         )
 
-    db.delete(follow)
-    db.commit()
+    await db.delete(follow)
+    followers_count = target_user.followers_count - 1
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(followers_count=User.followers_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    await remove_author_from_timeline(db, follower_id=current_user.id, following_id=user_id)
+    await update_fanout_mode(db, target_user, followers_count)
+    await db.commit()
 
     return {"message": "User unfollowed successfully"}
 
 @router.get("/{user_id}/followers", response_model=FollowerListResponse)
-def get_followers(user_id: int, db: Annotated[Session, Depends(get_db)]):
-    user = db.query(User).filter(User.id == user_id, User.is_verified == True).first()
+async def get_followers(user_id: int, db: Annotated[AsyncSession, Depends(get_read_db)]):
+    user = (await db.execute(
+        select(User).where(User.id == user_id, User.is_verified == True)
+    )).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Get followers with their usernames
-    followers = (
-        db.query(User)
+    followers = (await db.execute(
+        select(User)
         .join(Follow, Follow.follower_id == User.id)
-        .filter(Follow.following_id == user_id)
-        .all()
-    )
+        .where(Follow.following_id == user_id)
+    )).scalars().all()
 
     return FollowerListResponse(
         count=len(followers),
@@ -101,18 +139,19 @@ def get_followers(user_id: int, db: Annotated[Session, Depends(get_db)]):
 
 
 @router.get("/{user_id}/following", response_model=FollowingListResponse)
-def get_following(user_id: int, db: Annotated[Session, Depends(get_db)]):
-    user = db.query(User).filter(User.id == user_id, User.is_verified == True).first()
+async def get_following(user_id: int, db: Annotated[AsyncSession, Depends(get_read_db)]):
+    user = (await db.execute(
+        select(User).where(User.id == user_id, User.is_verified == True)
+    )).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Get following users with their usernames
-    following = (
-        db.query(User)
+    following = (await db.execute(
+        select(User)
         .join(Follow, Follow.following_id == User.id)
-        .filter(Follow.follower_id == user_id)
-        .all()
-    )
+        .where(Follow.follower_id == user_id)
+    )).scalars().all()
 
     return FollowingListResponse(
         count=len(following),
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.connection import engine, async_engine, sync_pool_metrics, async_pool_metrics
+from app.database.routing import replica_router
+from app.dependencies import get_db, require_internal_token
+from app.core.security import decoded_tokens
+from app.core.notification_outbox import notification_sender
+from app.core.socketio_manager import socket_emitter
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    dependencies=[Depends(require_internal_token)]
+)
+
+@router.get("/db/pool")
+def get_pool_stats():
+    """Connection pool state for the primary engines and any read replicas"""
+    return {
+        "async": async_pool_metrics.snapshot(async_engine.pool),
+        "sync": sync_pool_metrics.snapshot(engine.pool),
+        "replicas": [
+            {**replica.metrics.snapshot(replica.engine.pool), "healthy": replica.healthy}
+            for replica in replica_router.replicas
+        ],
+    }
+
+
+@router.get("/auth/token-cache")
+def get_token_cache_stats():
+    """Hit/miss counters of the decoded JWT cache"""
+    return decoded_tokens.stats()
+
+
+@router.get("/notifications/outbox")
+async def get_notification_outbox_stats(db: AsyncSession = Depends(get_db)):
+    """Pending notification deliveries, age of the oldest one and delivery counters"""
+    return await notification_sender.stats(db)
+
+
+@router.get("/socket/emitter")
+def get_socket_emitter_stats():
+    """Socket.IO emits scheduled from sync code: pending, dropped and failed counters"""
+    return socket_emitter.stats()
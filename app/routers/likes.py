@@ -1,8 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.models import Post, Like, User, Notification, NotificationType
+from sqlalchemy import select, update, delete, func, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Post, Like, Notification, NotificationType
 from app.dependencies import get_verified_user, get_db
+from app.core.principal_cache import Principal
+from app.core.config import settings
+from app.core.like_buffer import like_buffer
+from app.core.notification_helper import stage_notification, dispatch_notification
 from typing import Annotated
+import asyncio
 
 
 router = APIRouter(
@@ -11,85 +18,133 @@ router = APIRouter(
 )
 
 
-@router.post("/{post_id}/like")
-def like_post(
-    post_id: int,
-    db: Annotated[Session, Depends(get_db)],
-    user: User = Depends(get_verified_user)
-):
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
+async def get_likes_count(db: AsyncSession, post_id: int) -> int:
+    """Current likes_count of a post including buffered deltas, raises 404 if it does not exist"""
+    likes_count = (await db.execute(
+        select(Post.likes_count).where(Post.id == post_id)
+    )).scalar_one_or_none()
+
+    if likes_count is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Post not found"
         )
-    
-    existing_like = db.query(Like).filter(
-        Like.post_id == post_id,
-        Like.user_id == user.id
-    ).first()
-    
-    if existing_like:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="You already liked this post"
+    return like_buffer.overlay(post_id, likes_count)
+
+
+@router.post("/{post_id}/like")
+async def like_post(
+    post_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    user: Principal = Depends(get_verified_user)
+):
+    # Insert the like (no-op if it already exists or the post is missing)
+    inserted_like = (
+        insert(Like)
+        .from_select(
+            ["post_id", "user_id"],
+            select(Post.id, literal(user.id)).where(Post.id == post_id)
         )
-    new_like = Like(post_id=post_id, user_id=user.id)
-    post.likes_count += 1
-    
-    db.add(new_like)
-    db.commit()
-    db.refresh(post)
-    
-    # Create notification for post owner (only if not liking own post) and emit via Socket.IO
-    if post.user_id != user.id:
-        from app.core.notification_helper import create_and_emit_notification_sync
-        create_and_emit_notification_sync(
+        .on_conflict_do_nothing(index_elements=["post_id", "user_id"])
+        .returning(Like.post_id)
+        .cte("inserted_like")
+    )
+    if settings.LIKE_WRITE_BEHIND:
+        # Only record the like, the likes_count delta is buffered and flushed in batches
+        statement = (
+            select(Post.likes_count, Post.user_id)
+            .where(Post.id == inserted_like.c.post_id)
+        )
+    else:
+        # Bump likes_count in the same statement, only when a row was actually inserted
+        statement = (
+            update(Post)
+            .where(Post.id == inserted_like.c.post_id)
+            .values(likes_count=Post.likes_count + 1)
+            .returning(Post.likes_count, Post.user_id)
+            .execution_options(synchronize_session=False)
+        )
+    result = (await db.execute(statement)).first()
+
+    # Notify the post owner (only if not liking own post) in the same transaction as the like
+    staged = None
+    if result is not None and result[1] != user.id:
+        staged = await stage_notification(
             db=db,
-            user_id=post.user_id,
+            user_id=result[1],
             actor_id=user.id,
+            actor_username=user.username,
             notification_type=NotificationType.LIKE,
             post_id=post_id
         )
-    
+    await db.commit()
+
+    # Liking twice is a no-op
+    if result is None:
+        return {
+            "success": True,
+            "message": "Post already liked",
+            "likes_count": await get_likes_count(db, post_id)
+        }
+
+    likes_count, _ = result
+    if settings.LIKE_WRITE_BEHIND:
+        if like_buffer.add(post_id, 1):
+            await asyncio.to_thread(like_buffer.flush)
+        likes_count = like_buffer.overlay(post_id, likes_count)
+
+    # Emit via Socket.IO now that the like and notification are committed
+    if staged:
+        dispatch_notification(staged)
+
     return {
         "success": True,
         "message": "Post liked successfully",
-        "likes_count": post.likes_count
+        "likes_count": likes_count
     }
 
 
 @router.delete("/{post_id}/like")
-def unlike_post(
+async def unlike_post(
     post_id: int,
-    db: Annotated[Session, Depends(get_db)],
-    user: User = Depends(get_verified_user)
+    db: Annotated[AsyncSession, Depends(get_db)],
+    user: Principal = Depends(get_verified_user)
 ):
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Post not found"
-        )
-    
-    existing_like = db.query(Like).filter(
-        Like.post_id == post_id,
-        Like.user_id == user.id
-    ).first()
-    
-    if not existing_like:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="You haven't liked this post"
+    deleted_like = (
+        delete(Like)
+        .where(Like.post_id == post_id, Like.user_id == user.id)
+        .returning(Like.post_id)
+        .cte("deleted_like")
+    )
+    if settings.LIKE_WRITE_BEHIND:
+        statement = select(Post.likes_count).where(Post.id == deleted_like.c.post_id)
+    else:
+        # Decrement likes_count in the same statement, only if a row was deleted
+        statement = (
+            update(Post)
+            .where(Post.id == deleted_like.c.post_id)
+            .values(likes_count=func.greatest(Post.likes_count - 1, 0))
+            .returning(Post.likes_count)
+            .execution_options(synchronize_session=False)
         )
+    likes_count = (await db.execute(statement)).scalar_one_or_none()
+    await db.commit()
+
+    # Unliking a post that is not liked is a no-op
+    if likes_count is None:
+        return {
+            "success": True,
+            "message": "Post not liked",
+            "likes_count": await get_likes_count(db, post_id)
+        }
+
+    if settings.LIKE_WRITE_BEHIND:
+        if like_buffer.add(post_id, -1):
+            await asyncio.to_thread(like_buffer.flush)
+        likes_count = like_buffer.overlay(post_id, likes_count)
 
-    post.likes_count = max(0, post.likes_count - 1)
-    db.delete(existing_like)
-    db.commit()
-    db.refresh(post)
-    
     return {
         "success": True,
         "message": "Post unliked successfully",
-        "likes_count": post.likes_count
-    }
\ No newline at end of file
+        "likes_count": likes_count
+    }
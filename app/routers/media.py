@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from app.core.cloudinary_upload import (
+    LocalStorage,
+    MediaTooLarge,
+    MediaValidationError,
+    stage_stream,
+    storage,
+    store_staged_media
+)
+from app.core.security import verify_media_upload_token
+import asyncio
+
+# Signed-URL upload target for the local storage backend, standing in for direct uploads to Cloudinary
+router = APIRouter(
+    prefix="/uploads",
+    tags=["media"]
+)
+
+@router.put("/{media_ref}")
+async def upload_media(media_ref: str, request: Request):
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    claims = verify_media_upload_token(media_ref)
+    if not claims:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or expired upload URL"
+        )
+
+    key, content_type = claims["key"], claims["content_type"]
+    if storage.resolve_upload(key, content_type):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Media already uploaded"
+        )
+
+    try:
+        staged = await stage_stream(request.stream(), content_type)
+    except MediaTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except MediaValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    media_url = await asyncio.to_thread(store_staged_media, staged, key)
+    return {
+        "success": True,
+        "media_url": media_url
+    }
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import Notification, NotificationType, User
 from app.schemas import NotificationResponse, NotificationListResponse
-from app.dependencies import get_verified_user, get_db
+from app.dependencies import get_verified_user, get_db, get_read_db
+from app.core.principal_cache import Principal
+from app.core.counters import counters, get_count, notifications_key, unread_notifications_key, unread_notifications_filter
+from app.core.notification_helper import generate_notification_message
 from typing import Annotated
+from datetime import datetime
 import math
 
 
@@ -13,43 +18,46 @@ router = APIRouter(
 )
 
 
-def generate_notification_message(notification_type: str, actor_username: str) -> str:
-    if notification_type == "follow":
-        return f"{actor_username} started following you"
-    elif notification_type == "like":
-        return f"{actor_username} liked your post"
-    elif notification_type == "comment":
-        return f"{actor_username} commented on your post"
-    return "New notification"
+async def get_read_watermark(db: AsyncSession, user_id: int) -> datetime | None:
+    """The user's read-all watermark, None if they never marked all as read"""
+    return (await db.execute(
+        select(User.notifications_read_at).where(User.id == user_id)
+    )).scalar_one_or_none()
+
+
+def is_notification_read(notification: Notification, read_at: datetime | None) -> bool:
+    return notification.is_read or (read_at is not None and notification.created_at <= read_at)
 
 
 @router.get("/", response_model=NotificationListResponse)
-def get_notifications(
+async def get_notifications(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     unread_only: bool = Query(False, description="Show only unread notifications"),
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+    db: AsyncSession = Depends(get_read_db),
+    user: Principal = Depends(get_verified_user)
 ):
-    query = db.query(Notification, User).join(
+    query = select(Notification, User).join(
         User, Notification.actor_id == User.id
-    ).filter(Notification.user_id == user.id)
+    ).where(Notification.user_id == user.id)
     
-    if unread_only:
-        query = query.filter(Notification.is_read == False)
-    total = query.count()
+    unread_count = await get_count(db, unread_notifications_key(user.id))
+    read_at = await get_read_watermark(db, user.id)
 
-    unread_count = db.query(Notification).filter(
-        Notification.user_id == user.id,
-        Notification.is_read == False
-    ).count()
+    if unread_only:
+        query = query.where(unread_notifications_filter(read_at))
+        total = unread_count
+    else:
+        total = await get_count(db, notifications_key(user.id))
     
     offset = (page - 1) * page_size
     total_pages = math.ceil(total / page_size) if total > 0 else 0
     
-    results = query.order_by(
-        Notification.created_at.desc()
-    ).offset(offset).limit(page_size).all()
+    results = (await db.execute(
+        query.order_by(
+            Notification.created_at.desc()
+        ).offset(offset).limit(page_size)
+    )).all()
    
     notifications = []
     for notification, actor in results:
@@ -57,10 +65,16 @@ def get_notifications(
             id=notification.id,
             type=notification.type.value,
             actor_username=actor.username,
+            actor_count=notification.actor_count,
+            sample_actors=[sample["username"] for sample in notification.sample_actors or []] or [actor.username],
             post_id=notification.post_id,
-            is_read=notification.is_read,
+            is_read=is_notification_read(notification, read_at),
             created_at=notification.created_at,
-            message=generate_notification_message(notification.type.value, actor.username)
+            message=generate_notification_message(
+                notification.type.value,
+                actor.username,
+                notification.actor_count
+            )
         ))
     
     return NotificationListResponse(
@@ -74,15 +88,17 @@ def get_notifications(
 
 
 @router.put("/{notification_id}/read")
-def mark_notification_as_read(
+async def mark_notification_as_read(
     notification_id: int,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_verified_user)
 ):
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == user.id
-    ).first()
+    notification = (await db.execute(
+        select(Notification).where(
+            Notification.id == notification_id,
+            Notification.user_id == user.id
+        )
+    )).scalar_one_or_none()
     
     if not notification:
         raise HTTPException(
@@ -90,37 +106,46 @@ def mark_notification_as_read(
             detail="Notification not found"
         )
     
-    notification.is_read = True
-    db.commit()
-    
+    was_unread = not is_notification_read(notification, await get_read_watermark(db, user.id))
+    if was_unread:
+        # Out-of-order read above the watermark, the only case that writes is_read
+        notification.is_read = True
+        await db.commit()
+        counters.incr(unread_notifications_key(user.id), -1)
+
     return {"success": True, "message": "Notification marked as read"}
 
 
 @router.put("/read-all")
-def mark_all_notifications_as_read(
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+async def mark_all_notifications_as_read(
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_verified_user)
 ):
-    db.query(Notification).filter(
-        Notification.user_id == user.id,
-        Notification.is_read == False
-    ).update({"is_read": True})
+    # Advance the watermark, a single-row write however many notifications are unread
+    await db.execute(
+        update(User)
+        .where(User.id == user.id)
+        .values(notifications_read_at=func.now())
+    )
     
-    db.commit()
+    await db.commit()
+    counters.set(unread_notifications_key(user.id), 0)
     
     return {"success": True, "message": "All notifications marked as read"}
 
 
 @router.delete("/{notification_id}")
-def delete_notification(
+async def delete_notification(
     notification_id: int,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_verified_user)
 ):
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == user.id
-    ).first()
+    notification = (await db.execute(
+        select(Notification).where(
+            Notification.id == notification_id,
+            Notification.user_id == user.id
+        )
+    )).scalar_one_or_none()
     
     if not notification:
         raise HTTPException(
@@ -128,7 +153,12 @@ def delete_notification(
             detail="Notification not found"
         )
     
-    db.delete(notification)
-    db.commit()
+    was_unread = not is_notification_read(notification, await get_read_watermark(db, user.id))
+    await db.delete(notification)
+    await db.commit()
+
+    counters.incr(notifications_key(user.id), -1)
+    if was_unread:
+        counters.incr(unread_notifications_key(user.id), -1)
     
     return {"success": True, "message": "Notification deleted"}
@@ -1,103 +1,327 @@
 from fastapi import APIRouter, UploadFile, File, Depends, Form, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from app.models import Post, User
-from app.schemas import PostResponse, PostListResponse, PostUpdate
-from app.core import upload_to_cloudinary
-from app.dependencies import get_verified_user, get_current_user, get_db
+from sqlalchemy import select, tuple_, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Post, User, MediaAsset, Like, UploadTicket
+from app.schemas import PostResponse, PostListResponse, PostUpdate, UploadTicketRequest, UploadTicketResponse, MediaVariants
+from app.core import settings, stage_upload, MediaValidationError, MediaTooLarge
+from app.core.cloudinary_upload import StagedMedia, MEDIA_EXTENSIONS, storage
+from app.core.media_processing import get_or_create_media_asset
+from app.core.media_uploads import enqueue_media_upload, start_media_upload, pending_media_path
+from app.core.security import create_media_upload_token, verify_media_upload_token
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.like_buffer import like_buffer
+from app.core.timeline import fan_out_post, retract_post
+from app.core.counters import counters, get_count, public_posts_key, private_posts_key
+from app.dependencies import get_verified_user, get_current_user, get_db, get_read_db
+from app.core.principal_cache import Principal
 from typing import Optional
+import asyncio
 import math
+import os
+import uuid
 
 router = APIRouter(
     prefix="/posts",
     tags=["posts"]
 )
 
+# Fields that can be requested with expand= on get_posts and get_post
+EXPAND_FIELDS = {"author", "liked_by_me", "comments_count"}
+
+async def _stage_media(media: UploadFile) -> StagedMedia:
+    try:
+        return await asyncio.to_thread(stage_upload, media.file)
+    except MediaTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except MediaValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+async def _store_media(db: AsyncSession, staged: StagedMedia) -> MediaAsset:
+    try:
+        return await get_or_create_media_asset(db, staged)
+    except MediaValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to upload media: {str(e)}"
+        )
+
+
+async def _resolve_media_ref(
+    media_ref: str,
+    user_id: int,
+    version: str | None = None,
+    signature: str | None = None
+) -> tuple[str, str]:
+    """Storage key and URL of media uploaded directly to storage with a ticket issued to this user"""
+    # The ticket only limits how long the upload may take, not when the post is created
+    claims = verify_media_upload_token(media_ref, verify_exp=False)
+    if not claims or claims.get("uid") != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid media reference"
+        )
+
+    try:
+        media_url = await asyncio.to_thread(
+            storage.resolve_upload, claims["key"], claims["content_type"], version, signature
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to look up media: {str(e)}"
+        )
+    if not media_url:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Media has not been uploaded yet or its upload signature is invalid"
+        )
+    return claims["key"], media_url
+
+
+async def _claim_upload_ticket(db: AsyncSession, key: str, user_id: int, post_id: int):
+    """Attach a ticket's media to a post, once: the conditional UPDATE only matches an unused ticket"""
+    claimed = (await db.execute(
+        update(UploadTicket)
+        .where(UploadTicket.key == key, UploadTicket.user_id == user_id, UploadTicket.used_at.is_(None))
+        .values(used_at=func.now(), post_id=post_id)
+        .returning(UploadTicket.key)
+        .execution_options(synchronize_session=False)
+    )).scalar_one_or_none()
+    if claimed is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Media reference has already been used"
+        )
+
+
+def _parse_expand(expand: Optional[str]) -> set[str]:
+    fields = {field.strip() for field in (expand or "").split(",") if field.strip()}
+    unknown = fields - EXPAND_FIELDS
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown expand field(s): {', '.join(sorted(unknown))}"
+        )
+    return fields
+
+
+async def _load_expansions(db: AsyncSession, user_id: int, post_ids: list[int], expand: set[str]) -> dict:
+    """Requested expand fields for a whole page, one IN (...) query per field, keyed by post id.
+    comments_count needs no query, it is a column of posts."""
+    expansions = {}
+    if not post_ids:
+        return expansions
+
+    if "liked_by_me" in expand:
+        liked = set((await db.execute(
+            select(Like.post_id).where(Like.user_id == user_id, Like.post_id.in_(post_ids))
+        )).scalars().all())
+        expansions["liked_by_me"] = {post_id: post_id in liked for post_id in post_ids}
+
+    return expansions
+
+
+def _expanded_fields(post: Post, expand: set[str], expansions: dict) -> dict:
+    fields = {name: values[post.id] for name, values in expansions.items()}
+    if "author" in expand:
+        fields["author_id"] = post.user_id
+    if "comments_count" in expand:
+        fields["comments_count"] = post.comments_count
+    return fields
+
+
+@router.post("/media/upload-ticket", response_model=UploadTicketResponse)
+async def create_upload_ticket(
+    data: UploadTicketRequest,
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_verified_user)
+):
+    """Signed parameters for uploading media straight to storage, bypassing the API"""
+    if data.content_type not in MEDIA_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported media type"
+        )
+
+    key = uuid.uuid4().hex
+    media_ref = create_media_upload_token(user.id, key, data.content_type)
+    # Recorded so the media_ref can be attached to a single post
+    db.add(UploadTicket(key=key, user_id=user.id, content_type=data.content_type))
+    await db.commit()
+    return UploadTicketResponse(
+        media_ref=media_ref,
+        expires_in=settings.MEDIA_TICKET_EXPIRE_MINUTES * 60,
+        **storage.create_upload_ticket(key, data.content_type, media_ref)
+    )
+
+
 @router.post("/", response_model=PostResponse)
 async def create_post(
     content: str = Form(None),
     media: UploadFile = File(None),
+    media_ref: Optional[str] = Form(None, description="media_ref of a completed upload ticket"),
+    media_version: Optional[str] = Form(None, description="version returned by Cloudinary for the media_ref upload"),
+    media_signature: Optional[str] = Form(None, description="signature returned by Cloudinary for the media_ref upload"),
     is_private: bool = Form(False),
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_verified_user)
 ):
-    if not content and not media:
+    if not content and not media and not media_ref:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Post must have either content or media"
         )
     
+    staged = None
+    asset = None
+    media_key = None
     media_url = None
-    if media and media.filename:
-        try:
-            media_url = upload_to_cloudinary(media.file)
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to upload media: {str(e)}"
-            )
+    try:
+        if media_ref:
+            media_key, media_url = await _resolve_media_ref(media_ref, user.id, media_version, media_signature)
+        elif media and media.filename:
+            staged = await _stage_media(media)
+            if not settings.MEDIA_ASYNC_UPLOAD:
+                asset = await _store_media(db, staged)
+                media_url = asset.original_url
 
-    post = Post(
-        user_id=user.id,
-        content=content,
-        media_url=media_url,
-        is_private=is_private
-    )
-    db.add(post)
-    db.commit()
-    db.refresh(post)
+        post = Post(
+            user_id=user.id,
+            content=content,
+            media_url=media_url,
+            media_asset=asset,
+            media_pending=staged is not None and media_url is None,
+            is_private=is_private
+        )
+        db.add(post)
+        await db.flush()
+        if media_key:
+            await _claim_upload_ticket(db, media_key, user.id, post.id)
+        if post.media_pending:
+            # Committed with the post, so the upload is retried if this process dies before it finishes
+            await enqueue_media_upload(db, post.id, staged)
+
+        # Fan-out-on-write: materialize the post in the author's and followers' home timelines
+        await fan_out_post(db, post)
+
+        await db.commit()
+    except Exception:
+        # Nothing references the staged file unless the post committed
+        if staged is not None:
+            staged.discard()
+        raise
+
+    await db.refresh(post)
+    counters.incr(private_posts_key(user.id) if post.is_private else public_posts_key())
+
+    if post.media_pending:
+        start_media_upload(post.id, staged)
 
     return PostResponse(
         id=post.id,
         content=post.content,
         media_url=post.media_url,
+        media_pending=post.media_pending,
+        media_variants=MediaVariants.from_asset(post.media_asset),
         is_private=post.is_private,
-        likes_count=post.likes_count,
+        likes_count=like_buffer.overlay(post.id, post.likes_count),
         created_at=post.created_at,
         author_username=user.username
     )
 
 
 @router.get("/", response_model=PostListResponse)
-def get_posts(
+async def get_posts(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=100, description="Items per page"),
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor"),
+    include_total: Optional[bool] = Query(None, description="Count total posts (defaults to true in page mode)"),
+    expand: Optional[str] = Query(None, description="Comma-separated extra fields: author, liked_by_me, comments_count"),
+    db: AsyncSession = Depends(get_read_db),
+    user: Principal = Depends(get_verified_user)
 ):
-    query = db.query(Post, User).join(User, Post.user_id == User.id).filter(
+    expand_fields = _parse_expand(expand)
+    query = select(Post, User).join(User, Post.user_id == User.id).where(
         (Post.is_private == False) | (Post.user_id == user.id)
     )
-    
 
-    total = query.count()
-    total_pages = math.ceil(total / page_size)
-    offset = (page - 1) * page_size
-    results = query.order_by(Post.created_at.desc()).offset(offset).limit(page_size).all()
-    
+    if include_total is None:
+        include_total = cursor is None
+
+    total = None
+    total_pages = None
+    if include_total:
+        total = await get_count(db, public_posts_key()) + await get_count(db, private_posts_key(user.id))
+        total_pages = math.ceil(total / page_size)
+
+    if cursor is not None:
+        position = decode_cursor(cursor)
+        if not position:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        # Keyset pagination: seek past the last seen (created_at, id) instead of OFFSET
+        query = query.where(tuple_(Post.created_at, Post.id) < tuple_(*position))
+
+    query = query.order_by(Post.created_at.desc(), Post.id.desc())
+    if cursor is None:
+        query = query.offset((page - 1) * page_size)
+
+    # Fetch one extra row to know whether another page exists
+    results = (await db.execute(query.limit(page_size + 1))).all()
+    next_cursor = None
+    if len(results) > page_size:
+        results = results[:page_size]
+        last_post = results[-1][0]
+        next_cursor = encode_cursor(last_post.created_at, last_post.id)
+
+    expansions = await _load_expansions(db, user.id, [post.id for post, _ in results], expand_fields)
+
     return PostListResponse(
         posts=[PostResponse(
             id=post.id,
             content=post.content,
             media_url=post.media_url,
+            media_pending=post.media_pending,
+            media_variants=MediaVariants.from_asset(post.media_asset),
             is_private=post.is_private,
-            likes_count=post.likes_count,
+            likes_count=like_buffer.overlay(post.id, post.likes_count),
             created_at=post.created_at,
-            author_username=user.username
-        ) for post, user in results],
+            author_username=author.username,
+            **_expanded_fields(post, expand_fields, expansions)
+        ) for post, author in results],
         total=total,
-        page=page,
+        page=page if cursor is None else None,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor
     )
 
 
 @router.get("/{post_id}", response_model=PostResponse)
-def get_post(
+async def get_post(
     post_id: int,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+    expand: Optional[str] = Query(None, description="Comma-separated extra fields: author, liked_by_me, comments_count"),
+    db: AsyncSession = Depends(get_read_db),
+    user: Principal = Depends(get_verified_user)
 ):
-    result = db.query(Post, User).join(User, Post.user_id == User.id).filter(Post.id == post_id).first()
+    expand_fields = _parse_expand(expand)
+    result = (await db.execute(
+        select(Post, User).join(User, Post.user_id == User.id).where(Post.id == post_id)
+    )).first()
     
     if not result:
         raise HTTPException(
@@ -112,15 +336,20 @@ def get_post(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to view this post"
         )
+
+    expansions = await _load_expansions(db, user.id, [post.id], expand_fields)
     
     return PostResponse(
         id=post.id,
         content=post.content,
         media_url=post.media_url,
+        media_pending=post.media_pending,
+        media_variants=MediaVariants.from_asset(post.media_asset),
         is_private=post.is_private,
-        likes_count=post.likes_count,
+        likes_count=like_buffer.overlay(post.id, post.likes_count),
         created_at=post.created_at,
-        author_username=author.username
+        author_username=author.username,
+        **_expanded_fields(post, expand_fields, expansions)
     )
 
 
@@ -130,10 +359,10 @@ async def update_post(
     content: Optional[str] = Form(None),
     media: Optional[UploadFile] = File(None),
     is_private: Optional[bool] = Form(None),
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_verified_user)
 ):
-    post = db.query(Post).filter(Post.id == post_id).first()
+    post = await db.get(Post, post_id)
     
     if not post:
         raise HTTPException(
@@ -151,40 +380,65 @@ async def update_post(
     if content is not None:
         post.content = content
     
-    if media and media.filename:
-        try:
-            media_url = upload_to_cloudinary(media.file)
-            post.media_url = media_url
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to upload media: {str(e)}"
-            )
-    
-    if is_private is not None:
-        post.is_private = is_private
-    
-    db.commit()
-    db.refresh(post)
+    staged = None
+    replaced_path = None
+    try:
+        if media and media.filename:
+            staged = await _stage_media(media)
+            if settings.MEDIA_ASYNC_UPLOAD:
+                post.media_pending = True
+                replaced_path = await enqueue_media_upload(db, post.id, staged)
+            else:
+                asset = await _store_media(db, staged)
+                post.media_url = asset.original_url
+                post.media_asset = asset
+
+        privacy_changed = is_private is not None and is_private != post.is_private
+        if privacy_changed:
+            post.is_private = is_private
+            if is_private:
+                await retract_post(db, post)
+            else:
+                await fan_out_post(db, post, include_author=False)
+
+        await db.commit()
+    except Exception:
+        if staged is not None:
+            staged.discard()
+        raise
+
+    await db.refresh(post)
+    if replaced_path and os.path.exists(replaced_path):
+        os.remove(replaced_path)
+
+    if privacy_changed:
+        counters.incr(private_posts_key(user.id), 1 if post.is_private else -1)
+        counters.incr(public_posts_key(), -1 if post.is_private else 1)
+
+    if staged is not None and settings.MEDIA_ASYNC_UPLOAD:
+        start_media_upload(post.id, staged)
     
     return PostResponse(
         id=post.id,
         content=post.content,
         media_url=post.media_url,
+        media_pending=post.media_pending,
+        media_variants=MediaVariants.from_asset(post.media_asset),
         is_private=post.is_private,
-        likes_count=post.likes_count,
+        likes_count=like_buffer.overlay(post.id, post.likes_count),
         created_at=post.created_at,
+        author_username=user.username,
         author_id=post.user_id
     )
 
 
 @router.delete("/{post_id}")
-def delete_post(
+async def delete_post(
     post_id: int,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_verified_user)
 ):
-    post = db.query(Post).filter(Post.id == post_id).first()
+    post = await db.get(Post, post_id)
     
     if not post:
         raise HTTPException(
@@ -199,8 +453,14 @@ def delete_post(
             detail="You can only delete your own posts"
         )
     
-    db.delete(post)
-    db.commit()
+    was_private = post.is_private
+    staged_path = await pending_media_path(db, post.id) if post.media_pending else None
+    await db.delete(post)
+    await db.commit()
+    if staged_path and os.path.exists(staged_path):
+        os.remove(staged_path)
+
+    counters.incr(private_posts_key(user.id) if was_private else public_posts_key(), -1)
     
     return {
         "success": True,
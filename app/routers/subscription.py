@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import Subscription
 from app.dependencies import get_db, get_verified_user
-from app.models import PushSubscription, User
+from app.core.principal_cache import Principal
+from app.models import PushSubscription
 from app.core.notification_helper import send_web_push_to_user
+import asyncio
 
 
 router = APIRouter(
@@ -13,22 +16,24 @@ router = APIRouter(
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def save_subscription(
+async def save_subscription(
     sub: Subscription,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_verified_user)
 ):
     # Upsert the subscription so re-registering on the client simply refreshes the keys
-    existing = db.query(PushSubscription).filter(
-        PushSubscription.user_id == user.id,
-        PushSubscription.endpoint == str(sub.endpoint)
-    ).first()
+    existing = (await db.execute(
+        select(PushSubscription).where(
+            PushSubscription.user_id == user.id,
+            PushSubscription.endpoint == str(sub.endpoint)
+        )
+    )).scalar_one_or_none()
 
     if existing:
         existing.p256dh = sub.keys.p256dh
         existing.auth = sub.keys.auth
-        db.commit()
-        db.refresh(existing)
+        await db.commit()
+        await db.refresh(existing)
         return {"message": "Subscription updated"}
 
     new_subscription = PushSubscription(
@@ -38,42 +43,46 @@ def save_subscription(
         auth=sub.keys.auth
     )
     db.add(new_subscription)
-    db.commit()
-    db.refresh(new_subscription)
+    await db.commit()
+    await db.refresh(new_subscription)
 
     return {"message": "Subscribed"}
 
 
 @router.delete("/")
-def delete_subscription(
+async def delete_subscription(
     sub: Subscription,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_verified_user)
 ):
-    record = db.query(PushSubscription).filter(
-        PushSubscription.user_id == user.id,
-        PushSubscription.endpoint == str(sub.endpoint)
-    ).first()
+    record = (await db.execute(
+        select(PushSubscription).where(
+            PushSubscription.user_id == user.id,
+            PushSubscription.endpoint == str(sub.endpoint)
+        )
+    )).scalar_one_or_none()
 
     if record:
-        db.delete(record)
-        db.commit()
+        await db.delete(record)
+        await db.commit()
         return {"message": "Subscription deleted"}
 
     return {"message": "No subscription found"}
 
 
 @router.post("/test", status_code=status.HTTP_200_OK)
-def test_push_notification(
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+async def test_push_notification(
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_verified_user)
 ):
     """Test endpoint to manually send a push notification to the current user"""
     
     # Check if user has subscriptions
-    subscription_count = db.query(PushSubscription).filter(
-        PushSubscription.user_id == user.id
-    ).count()
+    subscription_count = (await db.execute(
+        select(func.count()).select_from(PushSubscription).where(
+            PushSubscription.user_id == user.id
+        )
+    )).scalar_one()
     
     if subscription_count == 0:
         return {
@@ -94,9 +103,9 @@ def test_push_notification(
         "message": "This is a test push notification!"
     }
     
-    # Send the push notification directly (synchronously for testing)
+    # Send the push notification directly (in a worker thread, webpush is blocking)
     try:
-        send_web_push_to_user(user.id, test_notification)
+        await asyncio.to_thread(send_web_push_to_user, user.id, test_notification)
         return {
             "success": True,
             "message": f"Test push notification sent to {subscription_count} subscription(s)",
@@ -1,18 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from app.schemas import UserCreate, UserResponse, ChangePassword, VerifyOTP, ForgotPassword, ResetPassword
-from sqlalchemy.orm import Session
-from app.dependencies import get_db, get_current_user, get_verified_user
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dependencies import get_db, get_read_db, get_current_user, get_verified_user
 from app.models import User, Post, Follow
+from app.core.principal_cache import Principal, principals, token_data
 from app.core import (
-    get_password_hash, 
-    verify_password, 
+    password_hasher,
+    password_needs_rehash,
+    PasswordHasherBusy,
     create_tokens, 
-    send_otp_email,
+    enqueue_otp_email,
     generate_otp,
     create_password_reset_token,
     verify_password_reset_token,
-    send_password_reset_email
+    enqueue_password_reset_email
 )
+from app.core.email_outbox import email_sender
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import Annotated
 from datetime import datetime, timedelta, timezone
@@ -23,31 +27,41 @@ router = APIRouter(
 )
 
 @router.get("/me")
-def get_user(
-    db: Annotated[Session, Depends(get_db)],
-    user: User = Depends(get_verified_user)):
+async def get_user(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    user: Principal = Depends(get_verified_user)):
     
     # Get posts count
-    posts_count = db.query(Post).filter(Post.user_id == user.id).count()
+    posts_count = (await db.execute(
+        select(func.count()).select_from(Post).where(Post.user_id == user.id)
+    )).scalar_one()
     
     # Get followers list
-    followers = db.query(Follow).filter(Follow.following_id == user.id).all()
+    followers = (await db.execute(
+        select(User.id, User.username)
+        .join(Follow, Follow.follower_id == User.id)
+        .where(Follow.following_id == user.id)
+    )).all()
     followers_list = [
         {
-            "id": follower.follower_id,
-            "username": db.query(User).filter(User.id == follower.follower_id).first().username
+            "id": follower_id,
+            "username": username
         }
-        for follower in followers
+        for follower_id, username in followers
     ]
     
     # Get following list
-    following = db.query(Follow).filter(Follow.follower_id == user.id).all()
+    following = (await db.execute(
+        select(User.id, User.username)
+        .join(Follow, Follow.following_id == User.id)
+        .where(Follow.follower_id == user.id)
+    )).all()
     following_list = [
         {
-            "id": follow.following_id,
-            "username": db.query(User).filter(User.id == follow.following_id).first().username
+            "id": following_id,
+            "username": username
         }
-        for follow in following
+        for following_id, username in following
     ]
     
     return {
@@ -61,9 +75,11 @@ def get_user(
     }
 
 @router.post("/register")
-def create_user(user: UserCreate,
-                db:Annotated[Session ,Depends(get_db)]):
-    is_user_exist = db.query(User).filter(User.email == user.email).first()
+async def create_user(user: UserCreate,
+                db:Annotated[AsyncSession, Depends(get_db)]):
+    is_user_exist = (await db.execute(
+        select(User).where(User.email == user.email)
+    )).scalar_one_or_none()
 
     if is_user_exist and is_user_exist.is_verified:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
@@ -74,34 +90,39 @@ def create_user(user: UserCreate,
 
     if not is_user_exist:
         # Create new user
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await password_hasher.hash(user.password)
         user_data = user.model_dump()
         user_data.pop("password")    
         new_user = User(**user_data, hashed_password = hashed_password,
                         otp = otp, expires_at = expires_at, is_used = False)
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        enqueue_otp_email(db, user.email, otp)
+        await db.commit()
+        await db.refresh(new_user)
     else:
         is_user_exist.username = user.username
-        is_user_exist.hashed_password = get_password_hash(user.password)
+        is_user_exist.hashed_password = await password_hasher.hash(user.password)
         is_user_exist.otp = otp
         is_user_exist.expires_at = expires_at
         is_user_exist.is_used = False
-        db.commit()
-        db.refresh(is_user_exist)
+        enqueue_otp_email(db, user.email, otp)
+        await db.commit()
+        await db.refresh(is_user_exist)
+        principals.invalidate(is_user_exist.id)
 
-    send_otp_email(user.email, otp)
+    email_sender.notify()
     return {
         "success": True,
         "message": "OTP sent to your email"
     }
 
 @router.post("/login", response_model=UserResponse)
-def login(form_data: Annotated[OAuth2PasswordRequestForm , Depends()], 
-          db: Annotated[Session, Depends(get_db)]):
+async def login(form_data: Annotated[OAuth2PasswordRequestForm , Depends()], 
+          db: Annotated[AsyncSession, Depends(get_db)]):
 
-    user = db.query(User).filter(User.username == form_data.username).first()
+    user = (await db.execute(
+        select(User).where(User.username == form_data.username)
+    )).scalar_one_or_none()
 
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
@@ -111,49 +132,71 @@ def login(form_data: Annotated[OAuth2PasswordRequestForm , Depends()],
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Please verify your email first")
 
-    if not verify_password(form_data.password, user.hashed_password):
+    if not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Incorrect password")
 
-    tokens = create_tokens(data={"sub": str(user.id)})
+    # Upgrade the stored hash when BCRYPT_ROUNDS changed since it was created
+    if password_needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = await password_hasher.hash(form_data.password)
+            await db.commit()
+        except PasswordHasherBusy:
+            pass
+
+    tokens = create_tokens(data=token_data(user))
     return {"access_token": tokens["access_token"], "refresh_token": tokens["refresh_token"]}
 
 
 @router.get("/refresh", response_model= UserResponse)
-def get_access_token(
-    db: Annotated[Session, Depends(get_db)],
-    user: User = Depends(get_verified_user)
+async def get_access_token(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    principal: Principal = Depends(get_verified_user)
 ):
-    tokens = create_tokens(data={"sub": str(user.id)})
+    # Claims are re-issued from the users row, not copied from the presented token
+    user = await db.get(User, principal.id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    if user.is_active is False:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Account is deactivated")
+    if not user.is_verified:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Please verify your email first")
+    principals.set(Principal.from_user(user))
+
+    tokens = create_tokens(data=token_data(user))
     return {"access_token": tokens["access_token"], "refresh_token": tokens["refresh_token"]}
 
 
 @router.post("/change-password")
-def change_password(
+async def change_password(
     data: ChangePassword,
-    db: Annotated[Session, Depends(get_db)],
-    user: User = Depends(get_verified_user)
+    db: Annotated[AsyncSession, Depends(get_db)],
+    principal: Principal = Depends(get_verified_user)
 ):
-    if not verify_password(hashed_password=user.hashed_password,plain_password= data.current_password):
+    user = await db.get(User, principal.id)
+    if not await password_hasher.verify(data.current_password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect Password")
 
-    user.hashed_password = get_password_hash(data.new_password)
-    db.commit()
-    db.refresh(user)
+    user.hashed_password = await password_hasher.hash(data.new_password)
+    await db.commit()
+    await db.refresh(user)
+    principals.invalidate(user.id)
 
     return {"success": True, "message": "Password Changed Successfully"}
 
 
 @router.post("/verify-otp", response_model=UserResponse)
-def verify_otp(
+async def verify_otp(
     data: VerifyOTP,
-    db: Annotated[Session, Depends(get_db)]
+    db: Annotated[AsyncSession, Depends(get_db)]
 ):
-    user = db.query(User).filter(
-        User.email == data.email,
-        User.otp == data.otp,
-        User.is_used == False
-    ).first()
+    user = (await db.execute(
+        select(User).where(
+            User.email == data.email,
+            User.otp == data.otp,
+            User.is_used == False
+        )
+    )).scalar_one_or_none()
 
     if not user:
         raise HTTPException(
@@ -171,11 +214,12 @@ def verify_otp(
     user.is_used = True
     user.is_verified = True
     user.otp = None
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    principals.invalidate(user.id)
 
     
-    tokens = create_tokens(data={"sub": str(user.id)})
+    tokens = create_tokens(data=token_data(user))
     return {
         "access_token": tokens["access_token"],
         "refresh_token": tokens["refresh_token"]
@@ -183,12 +227,14 @@ def verify_otp(
 
 
 @router.post("/forgot-password")
-def forgot_password(
+async def forgot_password(
     data: ForgotPassword,
-    db: Annotated[Session, Depends(get_db)]
+    db: Annotated[AsyncSession, Depends(get_db)]
 ):
 
-    user = db.query(User).filter(User.email == data.email).first()
+    user = (await db.execute(
+        select(User).where(User.email == data.email)
+    )).scalar_one_or_none()
     
     if not user:
         raise HTTPException(
@@ -204,7 +250,9 @@ def forgot_password(
     
     reset_token = create_password_reset_token(user.email)
 
-    send_password_reset_email(user.email, reset_token)
+    enqueue_password_reset_email(db, user.email, reset_token)
+    await db.commit()
+    email_sender.notify()
     
     return {
         "success": True,
@@ -213,9 +261,9 @@ def forgot_password(
 
 
 @router.post("/reset-password")
-def reset_password(
+async def reset_password(
     data: ResetPassword,
-    db: Annotated[Session, Depends(get_db)]
+    db: Annotated[AsyncSession, Depends(get_db)]
 ):
    
     email = verify_password_reset_token(data.token)
@@ -226,7 +274,9 @@ def reset_password(
             detail="Invalid or expired reset token"
         )
 
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.execute(
+        select(User).where(User.email == email)
+    )).scalar_one_or_none()
     
     if not user:
         raise HTTPException(
@@ -234,9 +284,10 @@ def reset_password(
             detail="User not found"
         )
 
-    user.hashed_password = get_password_hash(data.new_password)
-    db.commit()
-    db.refresh(user)
+    user.hashed_password = await password_hasher.hash(data.new_password)
+    await db.commit()
+    await db.refresh(user)
+    principals.invalidate(user.id)
     
     return {
         "success": True,
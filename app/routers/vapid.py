@@ -1,8 +1,10 @@
 from fastapi import APIRouter, status, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
 from app.dependencies import get_db, get_verified_user
-from app.models import PushSubscription, User
+from app.core.principal_cache import Principal
+from app.models import PushSubscription
 
 router = APIRouter(
     prefix="/vapid",
@@ -22,9 +24,9 @@ def get_vapid_public_key():
 
 
 @router.get("/debug")
-def debug_vapid_config(
-    db: Session = Depends(get_db),
-    user: User = Depends(get_verified_user)
+async def debug_vapid_config(
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_verified_user)
 ):
     """Debug endpoint to check VAPID configuration and user subscriptions"""
     
@@ -32,9 +34,11 @@ def debug_vapid_config(
     vapid_configured = bool(settings.VAPID_PUBLIC_KEY and settings.VAPID_PRIVATE_KEY)
     
     # Get user's subscriptions
-    subscriptions = db.query(PushSubscription).filter(
-        PushSubscription.user_id == user.id
-    ).all()
+    subscriptions = (await db.execute(
+        select(PushSubscription).where(
+            PushSubscription.user_id == user.id
+        )
+    )).scalars().all()
     
     return {
         "vapid_configured": vapid_configured,
@@ -1,6 +1,6 @@
 from .users import UserCreate, UserResponse, ChangePassword, VerifyOTP, ForgotPassword, ResetPassword
-from .posts import PostCreate, PostResponse, PostUpdate, PostListResponse
-from .comments import CommentResponse, CommentListResponse
+from .posts import PostCreate, PostResponse, PostUpdate, PostListResponse, UploadTicketRequest, UploadTicketResponse, MediaVariants
+from .comments import CommentResponse, CommentListResponse, CommentThreadResponse
 from .follow import FollowerResponse, FollowingResponse, FollowerListResponse, FollowingListResponse
 from .notifications import NotificationResponse, NotificationListResponse
 from .subscription import Subscription, SubscriptionKeys
@@ -8,7 +8,8 @@ from .subscription import Subscription, SubscriptionKeys
 __all__ = ["UserCreate", "UserResponse", "ChangePassword", 
            "VerifyOTP", "ForgotPassword", "ResetPassword",
            "PostCreate", "PostUpdate", "PostResponse", "PostListResponse",
-           "CommentResponse", "CommentListResponse",
+           "UploadTicketRequest", "UploadTicketResponse", "MediaVariants",
+           "CommentResponse", "CommentListResponse", "CommentThreadResponse",
            "FollowerResponse", "FollowingResponse", "FollowerListResponse", "FollowingListResponse",
            "NotificationResponse", "NotificationListResponse",
            "Subscription", "SubscriptionKeys"]
\ No newline at end of file
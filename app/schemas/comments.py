@@ -5,6 +5,9 @@ from typing import Optional, List
 class CommentResponse(BaseModel):
     id: int
     post_id: int
+    parent_id: Optional[int] = None
+    depth: int = 0
+    reply_count: int = 0
     username: str
     content: str
     created_at: datetime
@@ -16,7 +19,14 @@ class CommentResponse(BaseModel):
 
 class CommentListResponse(BaseModel):
     comments: List[CommentResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+class CommentThreadResponse(BaseModel):
+    # The root comment followed by its replies in display order
+    comments: List[CommentResponse]
+    next_cursor: Optional[str] = None
@@ -7,6 +7,9 @@ class NotificationResponse(BaseModel):
     id: int
     type: str
     actor_username: str
+    # Aggregated notifications: total actors and the most recent few usernames
+    actor_count: int = 1
+    sample_actors: List[str] = []
     post_id: Optional[int] = None
     is_read: bool
     created_at: datetime
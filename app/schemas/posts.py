@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Any
 from datetime import datetime
 
 
@@ -15,23 +15,57 @@ class PostUpdate(BaseModel):
     is_private: Optional[bool] = None
 
 
+class UploadTicketRequest(BaseModel):
+    content_type: str
+
+
+class UploadTicketResponse(BaseModel):
+    # Pass back to create_post once the upload is done
+    media_ref: str
+    upload_url: str
+    method: str
+    fields: dict[str, Any]
+    expires_in: int
+
+
+class MediaVariants(BaseModel):
+    """Resized WebP copies of an image, pick the smallest that fits"""
+    thumbnail: Optional[str] = None
+    feed: Optional[str] = None
+    full: Optional[str] = None
+
+    @classmethod
+    def from_asset(cls, asset) -> Optional["MediaVariants"]:
+        if asset is None or not asset.thumbnail_url:
+            return None
+        return cls(thumbnail=asset.thumbnail_url, feed=asset.feed_url, full=asset.full_url)
+
+
 class PostResponse(BaseModel):
     id: int
     content: Optional[str]
     media_url: Optional[str]
+    media_pending: bool = False
+    media_variants: Optional[MediaVariants] = None
     is_private: bool
     likes_count: int
     created_at: datetime
 
     author_username: str
 
+    # Only filled when requested through expand=
+    author_id: Optional[int] = None
+    liked_by_me: Optional[bool] = None
+    comments_count: Optional[int] = None
+
     class Config:
         from_attributes = True
 
 
 class PostListResponse(BaseModel):
     posts: List[PostResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None